@@ -0,0 +1,57 @@
+"""
+Benchmark of the row-wise cleaning steps against processing.normalize on the
+full HBO/WO/MBO inputs in the RAW data folder.
+
+    python benchmarks/bench_normalize.py
+"""
+import os
+import timeit
+
+import pandas as pd
+
+from tekkieworden.config import config
+from tekkieworden.processing.normalize import normalize_codes, lower, strip_first_word
+
+
+REPEAT = 5
+
+# (file, code columns, name column)
+INPUTS = [
+    (config.DUO_HBO_I_CSV, ["GEMEENTENUMMER", "OPLEIDINGSCODE ACTUEEL"], "OPLEIDINGSNAAM ACTUEEL"),
+    (config.DUO_HBO_D_CSV, ["GEMEENTENUMMER", "OPLEIDINGSCODE ACTUEEL"], "OPLEIDINGSNAAM ACTUEEL"),
+    (config.DUO_WO_I_CSV, ["GEMEENTENUMMER", "OPLEIDINGSCODE ACTUEEL"], "OPLEIDINGSNAAM ACTUEEL"),
+    (config.DUO_WO_D_CSV, ["GEMEENTENUMMER", "OPLEIDINGSCODE ACTUEEL"], "OPLEIDINGSNAAM ACTUEEL"),
+    (config.DUO_MBO_I_CSV, ["KWALIFICATIE CODE"], "KWALIFICATIE NAAM"),
+    (config.DUO_MBO_D_CSV, ["KWALIFICATIE CODE"], "KWALIFICATIE NAAM"),
+]
+
+
+def row_wise(df, code_cols, name_col):
+    for c in code_cols:
+        df[c].map("{:.0f}".format).astype(str)
+    df[name_col].str.extract(r"\s(.*)")
+    df[name_col].dropna().apply(lambda x: x.lower())
+
+
+def vectorized(df, code_cols, name_col):
+    for c in code_cols:
+        normalize_codes(df[c])
+    strip_first_word(df[name_col])
+    lower(df[name_col])
+
+
+def main():
+    print(f"{'file':<32}{'rows':>8}{'row-wise ms':>14}{'vectorized ms':>16}{'speedup':>10}")
+    for file, code_cols, name_col in INPUTS:
+        source = os.path.join(str(config.PATH_TO_RAW_DATA), file)
+        if not os.path.exists(source):
+            print(f"{file:<32} missing, skipped")
+            continue
+        df = pd.read_csv(source, sep=";")
+        old = min(timeit.repeat(lambda: row_wise(df, code_cols, name_col), number=1, repeat=REPEAT))
+        new = min(timeit.repeat(lambda: vectorized(df, code_cols, name_col), number=1, repeat=REPEAT))
+        print(f"{file:<32}{len(df):>8}{old * 1e3:>14.1f}{new * 1e3:>16.1f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Load test of the aggregation api: concurrent dashboard sessions firing a mix
+of top-N, time series and gender queries.
+
+    python benchmarks/bench_serve.py --clients 32 --requests 2000
+    python benchmarks/bench_serve.py --url http://127.0.0.1:8765
+
+Without --url the api is started in-process on the cubes in the MUNGED
+data folder (run munge.py first).
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from tekkieworden import dashboard_data, serve
+from tekkieworden.config import config
+
+
+MEASURES = list(config.STORE_MEASURES.values())
+
+
+def workload(n, seed=0) -> list:
+    """
+    :return: n (endpoint, params) pairs over the ho dimensions, with a long
+        tail of value selections like real sessions
+    """
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        dimension = rng.choice(config.CUBE_HO_DIMENSIONS)
+        params = {"level": "ho", "dimension": dimension, "measure": rng.choice(MEASURES)}
+        endpoint = rng.choice(["top", "timeseries", "gender"])
+        if endpoint == "top":
+            params["n"] = rng.choice([10, 15])
+        elif endpoint == "timeseries":
+            values = dashboard_data.rollup("ho", dimension, params["measure"]).index
+            params["values"] = rng.sample(list(values[:20]), k=min(3, len(values)))
+        queries.append((endpoint, params))
+    return queries
+
+
+def run(url, queries, clients) -> list:
+    local = threading.local()
+
+    def fire(query):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        endpoint, params = query
+        start = time.perf_counter()
+        local.session.get(f"{url}/{endpoint}", params=params, timeout=config.API_TIMEOUT).raise_for_status()
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        return list(pool.map(fire, queries))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="api to test, defaults to an in-process server")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    args = parser.parse_args()
+
+    try:
+        queries = workload(args.requests)
+    except FileNotFoundError as e:
+        print(e)
+        return
+
+    server = None
+    url = args.url
+    if url is None:
+        server = serve.make_server(port=0, workers=args.workers)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        start = time.perf_counter()
+        latencies = np.array(run(url, queries, args.clients)) * 1000
+        elapsed = time.perf_counter() - start
+        cache = requests.get(f"{url}/health").json()["cache"]
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+
+    print(f"{len(latencies)} requests, {args.clients} clients in {elapsed:.2f}s: {len(latencies) / elapsed:.0f} req/s")
+    print(
+        f"latency ms  p50 {np.percentile(latencies, 50):.1f}  p95 {np.percentile(latencies, 95):.1f}  "
+        f"p99 {np.percentile(latencies, 99):.1f}  max {latencies.max():.1f}"
+    )
+    print(f"cache {cache}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark of the row-wise sparklines against processing.sparklines.spark_lines
+on thousands of synthetic programmes with a few missing years.
+
+    python benchmarks/bench_sparklines.py
+"""
+import math
+import timeit
+
+import numpy as np
+
+from tekkieworden.processing.sparklines import spark_chars, spark_lines
+
+
+REPEAT = 5
+YEARS = 5
+SIZES = [1000, 10000, 100000]
+
+
+def spark_row(series):
+    # the per row implementation add_spark_charts used to call
+    series = [float(n) for n in series]
+    if all(math.isnan(n) for n in series):
+        return u" " * len(series)
+    minimum = min(n for n in series if not math.isnan(n))
+    maximum = max(n for n in series if not math.isnan(n))
+    if maximum == minimum:
+        return u"".join(" " if math.isnan(n) else spark_chars[0] for n in series)
+    coefficient = (len(spark_chars) - 1.0) / (maximum - minimum)
+    return u"".join(
+        " " if math.isnan(n) else spark_chars[int(round((n - minimum) * coefficient))] for n in series
+    )
+
+
+def row_wise(data):
+    return [spark_row(row) for row in data]
+
+
+def programmes(n, seed=0):
+    rng = np.random.default_rng(seed)
+    data = rng.gamma(2.0, 150.0, size=(n, YEARS)).round()
+    data[rng.random(data.shape) < 0.05] = np.nan
+    return data
+
+
+def main():
+    print(f"{'programmes':>12}{'row-wise ms':>14}{'vectorized ms':>16}{'speedup':>10}")
+    for n in SIZES:
+        data = programmes(n)
+        assert spark_lines(data).tolist() == row_wise(data)
+        old = min(timeit.repeat(lambda: row_wise(data), number=1, repeat=REPEAT))
+        new = min(timeit.repeat(lambda: spark_lines(data), number=1, repeat=REPEAT))
+        print(f"{n:>12}{old * 1000:>14.1f}{new * 1000:>16.1f}{old / new:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import os
 import pathlib
 import tekkieworden
 
@@ -6,22 +7,37 @@ PACKAGE_ROOT = pathlib.Path(tekkieworden.__file__).resolve().parent
 PATH_TO_RAW_DATA = PACKAGE_ROOT / "datasets/raw/"
 PATH_TO_MUNGED_DATA = PACKAGE_ROOT / "datasets/munged/"
 PATH_TO_FINAL_DATA = PACKAGE_ROOT / "datasets/final/"
+PATH_TO_CACHE = PACKAGE_ROOT / "datasets/cache/"
+PATH_TO_RUN_REPORTS = PACKAGE_ROOT / "datasets/run_reports/"
+PATH_TO_STORE = PACKAGE_ROOT / "datasets/store/"
 PATH_TO_CONFIG = PACKAGE_ROOT / "config"
 PATH_TO_DATA_QUALITY_REPORT = PACKAGE_ROOT / "docs/data_quality_report/"
 PATH_TO_PICS = PACKAGE_ROOT.parent.parent.parent / "docs/images/"
 PATH_TO_GAP_REPORT = PACKAGE_ROOT / "gap_report/"
 PATH_TO_CSS_FILES = PACKAGE_ROOT / "app/"
 
-FILE_YEAR = 2019
+# DUO release to download and munge, e.g. TEKKIEWORDEN_FILE_YEAR=2020
+FILE_YEAR = int(os.environ.get("TEKKIEWORDEN_FILE_YEAR", 2019))
 
 # url + csv filenames for Hoger Onderwijs Ingeschrevenen (_I) and Gediplomeerden (_D) from DUO.nl
 DUO_MAIN_URL = "https://duo.nl/open_onderwijsdata/images/"
-MBO_CSV_I_URL = DUO_MAIN_URL + "03-deelnemers-per-instelling-plaats-kenniscentrum-sector-bedrijfstak-type-mbo-opleiding-niveau-geslacht-2015-2019.csv"
-MBO_CSV_D_URL = DUO_MAIN_URL + "10-gediplomeerden-per-instelling-plaats-kenniscentrum-sector-bedrijfstak-type-mbo-opleiding-niveau-geslacht-2015-2019.csv"
-HBO_CSV_I_URL = DUO_MAIN_URL + "03b-eerstejaars-ingeschrevenen-hbo-domein-hbo-2019.csv"
-HBO_CSV_D_URL = DUO_MAIN_URL + "05-gediplomeerden-hbo-2019.csv"
-WO_CSV_I_URL = DUO_MAIN_URL + "03b-eerstejaars-ingeschrevenen-wo-domein-wo-2019.csv"
-WO_CSV_D_URL = DUO_MAIN_URL + "05-gediplomeerden-wo-2019.csv"
+MBO_CSV_I_URL = DUO_MAIN_URL + f"03-deelnemers-per-instelling-plaats-kenniscentrum-sector-bedrijfstak-type-mbo-opleiding-niveau-geslacht-{FILE_YEAR - 4}-{FILE_YEAR}.csv"
+MBO_CSV_D_URL = DUO_MAIN_URL + f"10-gediplomeerden-per-instelling-plaats-kenniscentrum-sector-bedrijfstak-type-mbo-opleiding-niveau-geslacht-{FILE_YEAR - 4}-{FILE_YEAR}.csv"
+HBO_CSV_I_URL = DUO_MAIN_URL + f"03b-eerstejaars-ingeschrevenen-hbo-domein-hbo-{FILE_YEAR}.csv"
+HBO_CSV_D_URL = DUO_MAIN_URL + f"05-gediplomeerden-hbo-{FILE_YEAR}.csv"
+WO_CSV_I_URL = DUO_MAIN_URL + f"03b-eerstejaars-ingeschrevenen-wo-domein-wo-{FILE_YEAR}.csv"
+WO_CSV_D_URL = DUO_MAIN_URL + f"05-gediplomeerden-wo-{FILE_YEAR}.csv"
+
+# streaming download settings. DUO serves ISO-8859-1, files are stored as UTF-8
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+DOWNLOAD_SOURCE_ENCODING = "ISO-8859-1"
+DOWNLOAD_TARGET_ENCODING = "utf-8"
+DOWNLOAD_PROGRESS_INTERVAL = 1024 * 1024  # log progress every MB
+DOWNLOAD_MAX_WORKERS = 6
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_BACKOFF = 1.0  # seconds, doubled after every failed attempt
+# ETag / Last-Modified / sha256 of every downloaded file, stored in the RAW data folder
+DOWNLOAD_MANIFEST_FILE = "duo_download_manifest.json"
 
 # files
 SDB_FILE = "studiekeuze123_all_20200417.xlsx"
@@ -38,6 +54,67 @@ DUO_HBO_D_CSV = f"hbo_gediplomeerden_{FILE_YEAR}.csv"
 DUO_WO_I_CSV = f"wo_inscriptions_{FILE_YEAR}.csv"
 DUO_WO_D_CSV = f"wo_gediplomeerden_{FILE_YEAR}.csv"
 
+# (url, file) pairs of all DUO sources: MBO/HBO/WO x ingeschrevenen/gediplomeerden
+DUO_DOWNLOADS = [
+    (HBO_CSV_I_URL, DUO_HBO_I_FILE),
+    (HBO_CSV_D_URL, DUO_HBO_D_FILE),
+    (WO_CSV_I_URL, DUO_WO_I_FILE),
+    (WO_CSV_D_URL, DUO_WO_D_FILE),
+    (MBO_CSV_I_URL, DUO_MBO_I_FILE),
+    (MBO_CSV_D_URL, DUO_MBO_D_FILE),
+]
+
+# rows per block when aggregating the MBO files, memory is bounded by the number of groups
+MBO_CHUNKSIZE = 50000
+
+# munged datasets. Stored as parquet ("parquet", "feather" or "csv"), csv kept as export
+MUNGED_TOTAL = "opleidingen_total_munged"
+MUNGED_HO_TECH = "opleidingen_ho_tech_filtered"
+MUNGED_MBO_TOTAL = "opleidingen_mbo_total_munged"
+MUNGED_MBO_TECH = "opleidingen_mbo_tech_filtered"
+MUNGED_FORMAT = "parquet"
+MUNGED_EXPORT_CSV = True
+# code columns are stored as strings to keep leading zeros, counts as float64
+MUNGED_CODE_COLS = [
+    "brinnummer_duo",
+    "opleidingscode_duo",
+    "brin_nummer",
+    "kwalificatie_code",
+]
+MUNGED_COUNT_REGEX = r"^\d{4}_"  # 2015_man_i, 2019_tot_d, ..
+MUNGED_FIGURE_REGEX = r"^(\d{4})_(man|vrouw|tot)_(i|d)$"  # year, gender, measure
+# long-format fact table of the HO tech file and its opleiding dimension table
+MUNGED_HO_FACTS = "opleidingen_ho_tech_facts"
+MUNGED_HO_DIMENSIONS = "opleidingen_ho_tech_dimensions"
+# aggregate cubes for the dashboards: rollups per dimension x measure x gender x year
+MUNGED_HO_CUBE = "opleidingen_ho_tech_cube"
+MUNGED_MBO_CUBE = "opleidingen_mbo_tech_cube"
+CUBE_HO_DIMENSIONS = [
+    "instellingsnaam_duo",
+    "opleidingsnaam_duo",
+    "ho_type",
+    "tech_label",
+    "soortopleiding_duo",
+]
+CUBE_MBO_DIMENSIONS = ["tech_label", "kwalificatie_naam", "brin_nummer"]
+# rendered dashboard charts kept in memory, shared by all app sessions
+RENDER_CACHE_SIZE = int(os.environ.get("TEKKIEWORDEN_RENDER_CACHE_SIZE", 64))
+
+# aggregation api over the cubes, see serve.py. When TEKKIEWORDEN_API_URL is set
+# (e.g. http://127.0.0.1:8765) the apps query it instead of loading the cubes
+SERVE_HOST = os.environ.get("TEKKIEWORDEN_SERVE_HOST", "127.0.0.1")
+SERVE_PORT = int(os.environ.get("TEKKIEWORDEN_SERVE_PORT", 8765))
+SERVE_WORKERS = int(os.environ.get("TEKKIEWORDEN_SERVE_WORKERS", 8))
+SERVE_CACHE_SIZE = 1024
+API_URL = os.environ.get("TEKKIEWORDEN_API_URL")
+API_TIMEOUT = 10
+
+# longitudinal store of all ingested DUO releases, partitioned by release and level
+STORE_DATASET = "opleidingen"
+STORE_LEVELS = ["hbo", "wo", "mbo"]
+# suffix of the munged year figure columns -> measure in the store
+STORE_MEASURES = {"i": "ingeschrevenen", "d": "gediplomeerden"}
+
 
 # studiekeuze123_all_20200417.xlsx columns to be dropped
 drop_studiekeuze_cols = [
@@ -147,7 +224,8 @@ tech_keywords = [
     "engineer",
     "informatica",
     "systeem",
-    "beheerder" "technische",
+    "beheerder",
+    "technische",
     "wiskunde",
     "mathematics",
     "applied",
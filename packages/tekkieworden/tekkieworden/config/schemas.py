@@ -0,0 +1,87 @@
+# dtype schemas of the raw DUO csv files, keyed by DUO file type.
+# usecols: columns to read, year figure columns are matched on year_regex.
+# Codes are read as strings (keeps leading zeros), repeated labels as
+# categories and year figures as nullable ints.
+
+YEAR_DTYPE = "Int32"
+
+HO_INSCHRIJVINGEN = {
+    "usecols": [
+        "PROVINCIE",
+        "GEMEENTENUMMER",
+        "TYPE HOGER ONDERWIJS",
+        "BRIN NUMMER ACTUEEL",
+        "INSTELLINGSNAAM ACTUEEL",
+        "CROHO ONDERDEEL",
+        "CROHO SUBONDERDEEL",
+        "OPLEIDINGSCODE ACTUEEL",
+        "OPLEIDINGSNAAM ACTUEEL",
+        "OPLEIDINGSVORM",
+        "GESLACHT",
+    ],
+    "dtype": {
+        "PROVINCIE": "category",
+        "GEMEENTENUMMER": str,
+        "TYPE HOGER ONDERWIJS": "category",
+        "BRIN NUMMER ACTUEEL": str,
+        "INSTELLINGSNAAM ACTUEEL": "category",
+        "CROHO ONDERDEEL": "category",
+        "CROHO SUBONDERDEEL": "category",
+        "OPLEIDINGSCODE ACTUEEL": str,
+        "OPLEIDINGSNAAM ACTUEEL": str,
+        "OPLEIDINGSVORM": "category",
+        "GESLACHT": "category",
+    },
+    "year_regex": r"^\d{4}$",  # 2015, ..
+}
+
+HO_GEDIPLOMEERDEN = {
+    "usecols": [
+        "PROVINCIE",
+        "GEMEENTENUMMER",
+        "BRIN NUMMER ACTUEEL",
+        "INSTELLINGSNAAM ACTUEEL",
+        "CROHO ONDERDEEL",
+        "CROHO SUBONDERDEEL",
+        "OPLEIDINGSCODE ACTUEEL",
+        "OPLEIDINGSNAAM ACTUEEL",
+        "OPLEIDINGSVORM",
+        "SOORT DIPLOMA",
+        "GESLACHT",
+    ],
+    "dtype": {
+        "PROVINCIE": "category",
+        "GEMEENTENUMMER": str,
+        "BRIN NUMMER ACTUEEL": str,
+        "INSTELLINGSNAAM ACTUEEL": "category",
+        "CROHO ONDERDEEL": "category",
+        "CROHO SUBONDERDEEL": "category",
+        "OPLEIDINGSCODE ACTUEEL": str,
+        "OPLEIDINGSNAAM ACTUEEL": str,
+        "OPLEIDINGSVORM": "category",
+        "SOORT DIPLOMA": "category",
+        "GESLACHT": "category",
+    },
+    "year_regex": r"^\d{4}$",
+}
+
+MBO = {
+    "usecols": ["BRIN NUMMER", "KWALIFICATIE CODE", "KWALIFICATIE NAAM"],
+    "dtype": {
+        "BRIN NUMMER": "category",
+        "KWALIFICATIE CODE": str,
+        "KWALIFICATIE NAAM": "category",
+    },
+    # MAN2015, DIPVRW2016, .. : DIP marks gediplomeerden, otherwise ingeschrevenen
+    "year_regex": r"^(?P<diploma>DIP)?(?P<gender>MAN|VROUW|VRW|TOTAAL)(?P<year>\d{4})$",
+    "genders": {"MAN": "man", "VROUW": "vrouw", "VRW": "vrouw", "TOTAAL": "tot"},
+}
+
+DUO_SCHEMAS = {
+    "hbo_i": HO_INSCHRIJVINGEN,
+    "hbo_d": HO_GEDIPLOMEERDEN,
+    "wo_i": HO_INSCHRIJVINGEN,
+    "wo_d": HO_GEDIPLOMEERDEN,
+    "mbo_i": MBO,
+    "mbo_d": MBO,
+}
@@ -0,0 +1,260 @@
+"""
+Data access for the streamlit dashboards. Only reads the precomputed
+aggregate cubes written by munge.py, so the apps never import the munge or
+profiling stack. When config.API_URL is set the queries are sent to the
+aggregation api of serve.py instead, and the apps are thin clients.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import requests
+
+from tekkieworden.config import config
+from tekkieworden.processing.cube import read_cube
+from tekkieworden.processing.ranking import RankingIndex
+from tekkieworden.processing.render_cache import RenderCache
+from tekkieworden.processing.writers import munged_path
+
+
+_logger = logging.getLogger(__name__)
+
+CUBES = {"ho": config.MUNGED_HO_CUBE, "mbo": config.MUNGED_MBO_CUBE}
+
+# cube name -> (file version, rollups, ranking indexes built so far). Lives as
+# long as the server process, streamlit reruns of the app script reuse it
+_cubes = {}
+_lock = threading.Lock()
+_warming = None
+_session = requests.Session()
+
+# rendered charts keyed on the widget state, shared by all app sessions
+charts = RenderCache(maxsize=config.RENDER_CACHE_SIZE)
+
+
+def _version(name) -> tuple:
+    for fmt in (config.MUNGED_FORMAT, "csv"):
+        source = munged_path(name, fmt=fmt)
+        if os.path.exists(source):
+            stat = os.stat(source)
+            return source, stat.st_mtime_ns, stat.st_size
+    raise FileNotFoundError(f"{name} not found in {config.PATH_TO_MUNGED_DATA}, run munge.py first")
+
+
+def rollups(level="ho") -> dict:
+    """
+    :param level: "ho" or "mbo"
+    :return: dict of (dimension, measure, gender) -> year table, see
+        cube.index_cube. Reloaded only when munge.py rewrote the cube
+    """
+    return _load(level)[1]
+
+
+def _load(level) -> tuple:
+    name = CUBES[level]
+    version = _version(name)
+    with _lock:
+        cached = _cubes.get(name)
+        if cached is not None and cached[0] == version:
+            return cached
+        start = time.perf_counter()
+        cached = _cubes[name] = (version, read_cube(name), {})
+    _logger.info(f"loaded {name} in {time.perf_counter() - start:.2f}s")
+    return cached
+
+
+def rollup(level, dimension, measure, gender="tot") -> pd.DataFrame:
+    """
+    :param level: "ho" or "mbo"
+    :param dimension: e.g. "tech_label", see config.CUBE_HO_DIMENSIONS
+    :param measure: "ingeschrevenen" or "gediplomeerden"
+    :param gender: "man", "vrouw" or "tot"
+    :return: pd.DataFrame indexed by the dimension values with one column per year
+    """
+    return rollups(level)[(dimension, measure, gender)]
+
+
+def ranking(level, dimension, measure, gender="tot") -> RankingIndex:
+    """
+    :return: RankingIndex of a rollup, built on first use per cube version
+    """
+    _, tables, rankings = _load(level)
+    key = (dimension, measure, gender)
+    if key not in rankings:
+        rankings[key] = RankingIndex(tables[key])
+    return rankings[key]
+
+
+def _latest(table, year):
+    if year is None:
+        return table.columns.max()
+    return int(year)
+
+
+def _top_n(level, dimension, measure, gender="tot", year=None, n=15, values=None) -> pd.DataFrame:
+    index = ranking(level, dimension, measure, gender)
+    where = None if values is None else index.mask(values)
+    return index.top(int(n), year=year, where=where).to_frame(name=measure)
+
+
+def _time_series(level, dimension, measure, gender="tot", values=None) -> pd.DataFrame:
+    table = rollup(level, dimension, measure, gender)
+    if values is None:
+        return table
+    return table[table.index.isin(values)]
+
+
+def _gender_breakdown(level, dimension, measure, year=None) -> pd.DataFrame:
+    tables = rollups(level)
+    total = tables[(dimension, measure, "tot")]
+    year = _latest(total, year)
+    genders = {
+        gender: tables[(dimension, measure, gender)].reindex(index=total.index, columns=[year])[year]
+        for gender in ["man", "vrouw"]
+        if (dimension, measure, gender) in tables
+    }
+    genders["tot"] = total[year]
+    return pd.DataFrame(genders)
+
+
+# endpoint -> query on the local cubes, served by serve.py
+QUERIES = {"top": _top_n, "timeseries": _time_series, "gender": _gender_breakdown}
+
+
+def query(endpoint, **params) -> pd.DataFrame:
+    """
+    Runs a query on the local cubes, or on the api when config.API_URL is set.
+    :param endpoint: key of QUERIES
+    :param params: keyword arguments of the query
+    :return: pd.DataFrame indexed by the dimension values
+    """
+    if config.API_URL:
+        return from_payload(_get(endpoint, params))
+    return QUERIES[endpoint](**params)
+
+
+def top_n(level, dimension, measure, gender="tot", year=None, n=15, values=None) -> pd.DataFrame:
+    """
+    :param year: year to rank on, defaults to the latest. "all" ranks on the
+        sum over all years
+    :param n: number of values returned
+    :param values: dimension values to rank, defaults to all
+    :return: pd.DataFrame of the n largest dimension values with one column,
+        the measure, sorted descending
+    """
+    return query(
+        "top", level=level, dimension=dimension, measure=measure, gender=gender, year=year, n=n, values=values
+    )
+
+
+def time_series(level, dimension, measure, gender="tot", values=None) -> pd.DataFrame:
+    """
+    :param values: dimension values to return, defaults to all
+    :return: pd.DataFrame indexed by the dimension values with one column per year
+    """
+    return query("timeseries", level=level, dimension=dimension, measure=measure, gender=gender, values=values)
+
+
+def gender_breakdown(level, dimension, measure, year=None) -> pd.DataFrame:
+    """
+    :param year: defaults to the latest
+    :return: pd.DataFrame indexed by the dimension values with a man, vrouw
+        and tot column, for the genders in the cube
+    """
+    return query("gender", level=level, dimension=dimension, measure=measure, year=year)
+
+
+def to_payload(df: pd.DataFrame) -> dict:
+    """
+    :return: json serializable dict of a query result, missing counts as None
+    """
+    data = df.to_numpy(dtype=float)
+    return {
+        "index_name": df.index.name,
+        "index": df.index.tolist(),
+        "columns": df.columns.tolist(),
+        "data": np.where(np.isnan(data), None, data).tolist(),
+    }
+
+
+def from_payload(payload: dict) -> pd.DataFrame:
+    df = pd.DataFrame(payload["data"], index=payload["index"], columns=payload["columns"], dtype=float)
+    df.index.name = payload["index_name"]
+    return df
+
+
+def _get(endpoint, params=None):
+    # an empty selection is sent as values= to tell it apart from no selection
+    params = {k: ("" if v == [] else v) for k, v in (params or {}).items() if v is not None}
+    response = _session.get(f"{config.API_URL.rstrip('/')}/{endpoint}", params=params, timeout=config.API_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def _hashable(value):
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+def cube_versions() -> tuple:
+    """
+    :return: versions of the cube files on disk, None for a missing cube
+    """
+    versions = []
+    for name in CUBES.values():
+        try:
+            versions.append(_version(name))
+        except FileNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def data_version() -> tuple:
+    """
+    :return: versions of the cubes behind the queries, part of every chart
+        key so a re-munge never serves stale charts
+    """
+    if config.API_URL:
+        return _hashable(_get("health")["data_version"])
+    return cube_versions()
+
+
+def warm(background=False):
+    """
+    Loads every cube, so the first user interaction does not pay for it.
+    :param background: load in a daemon thread and return immediately. Only
+        one warming thread is started per process
+    :return: the warming thread when background, else None
+    """
+    global _warming
+    if config.API_URL:
+        # the api server holds the cubes
+        return None
+    if background:
+        with _lock:
+            if _warming is None:
+                _warming = threading.Thread(target=warm, name="dashboard-warm", daemon=True)
+                _warming.start()
+        return _warming
+    load_cubes()
+
+
+def load_cubes():
+    """
+    Loads every cube on disk, regardless of config.API_URL.
+    """
+    for level in CUBES:
+        try:
+            rollups(level)
+        except FileNotFoundError as e:
+            _logger.warning(str(e))
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    warm()
+    print(f"warmed {len(_cubes)} cubes in {time.perf_counter() - start:.2f}s")
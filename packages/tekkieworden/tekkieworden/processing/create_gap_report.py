@@ -1,42 +1,26 @@
 import logging
-import pandas as pd
 from jinja2 import Environment, FileSystemLoader
 
 from weasyprint import HTML
 from weasyprint.fonts import FontConfiguration
 
 from tekkieworden.config import config
-from tekkieworden.processing.visual_helpers import create_spark_charts
+from tekkieworden.processing.facts import read_facts, pivot_years
+from tekkieworden.processing.sparklines import spark_lines
 
 
 _logger = logging.getLogger(__name__)
 
 
-def read_tech_file(path, file) -> pd.DataFrame:
-    df = pd.read_csv(filepath_or_buffer=path + "/" + file)
-    return df
+REPORT_COLS = ["instellingsnaam_duo", "opleidingsnaam_duo"]
 
 
-def add_spark_charts(input_df):
-    tot_cols = [
-        "2015_tot_i",
-        "2016_tot_i",
-        "2017_tot_i",
-        "2018_tot_i",
-        "2019_tot_i",
-    ]
-    df_agg = (
-        input_df.groupby(["instellingsnaam_duo", "opleidingsnaam_duo"])[tot_cols]
-        .agg("sum")
-        .reset_index()
-    )
-
-    spark_chart_list = []
-    for row in df_agg[tot_cols].values:
-        spark_chart_list.append(create_spark_charts(row))
-    sparkline = pd.DataFrame(spark_chart_list).rename(columns={0: "sparkline"})
+def add_spark_charts(facts, dims):
+    df_agg = pivot_years(facts, dims, "ingeschrevenen", gender="tot", by=REPORT_COLS).fillna(0)
+    sparklines = spark_lines(df_agg.to_numpy(), scale="row")
 
-    df_tech_report = pd.concat([df_agg, sparkline], axis=1)
+    df_agg.columns = [f"{year}_tot_i" for year in df_agg.columns]
+    df_tech_report = df_agg.reset_index().assign(sparkline=sparklines)
 
     return df_tech_report
 
@@ -62,10 +46,8 @@ def create_PDF_report(input_df, output_file):
 
 def main():
     # Read in the file and get our pivot table summary
-    df = read_tech_file(
-        str(config.PATH_TO_MUNGED_DATA), file="opleidingen_ho_tech_filtered.csv"
-    )
-    df_tech_report = add_spark_charts(input_df=df)
+    facts, dims = read_facts(config.MUNGED_HO_FACTS, config.MUNGED_HO_DIMENSIONS)
+    df_tech_report = add_spark_charts(facts, dims)
     create_PDF_report(input_df=df_tech_report, output_file="gap_report.pdf")
 
 
@@ -0,0 +1,68 @@
+import logging
+from typing import List, Tuple
+
+import pandas as pd
+
+from tekkieworden.config import config
+from tekkieworden.processing.readers import read_munged_file
+
+
+_logger = logging.getLogger(__name__)
+
+CUBE_COLS = ["dimension", "measure", "gender", "value", "year", "count"]
+
+
+def build_cube(facts_and_dims: Tuple[pd.DataFrame, pd.DataFrame], dimensions: List[str]) -> pd.DataFrame:
+    """
+    Precomputes the rollups the dashboards show: the sum of every measure,
+    gender and year per value of every dimension.
+    :param facts_and_dims: tuple of (facts, dims) from facts.build_facts
+    :param dimensions: dimension columns to roll up, e.g. config.CUBE_HO_DIMENSIONS
+    :return: long pd.DataFrame with the CUBE_COLS columns
+    """
+    facts, dims = facts_and_dims
+    flat = facts.reset_index()
+    positions = dims.index.get_indexer(flat["opleiding_id"])
+
+    parts = []
+    for dimension in dimensions:
+        values = pd.Series(dims[dimension].to_numpy()[positions], name="value")
+        values = values.astype(str).where(values.notnull())
+        rollup = (
+            flat.groupby([values, "measure", "gender", "year"], observed=True)["count"]
+            .sum()
+            .reset_index()
+        )
+        parts.append(rollup.assign(dimension=dimension))
+    cube = pd.concat(parts, ignore_index=True)[CUBE_COLS]
+    cube["measure"] = cube["measure"].astype(str)
+    cube["gender"] = cube["gender"].astype(str)
+    _logger.info(f"cube of {len(cube)} cells over {dimensions}")
+    return cube
+
+
+def index_cube(cube: pd.DataFrame) -> dict:
+    """
+    Splits a cube in one table per (dimension, measure, gender), so the apps
+    answer a widget change with a dict lookup.
+    :param cube: long cube from build_cube or read_cube
+    :return: dict of (dimension, measure, gender) -> pd.DataFrame indexed by
+        the dimension values with one column per year
+    """
+    rollups = {}
+    for key, part in cube.groupby(["dimension", "measure", "gender"], sort=False):
+        table = part.pivot(index="value", columns="year", values="count").sort_index(axis=1)
+        table.index.name = key[0]
+        table.columns = table.columns.astype(int)
+        table.columns.name = "year"
+        rollups[key] = table
+    return rollups
+
+
+def read_cube(name=None) -> dict:
+    """
+    :param name: name of the munged cube, defaults to config.MUNGED_HO_CUBE
+    :return: dict of rollups, see index_cube
+    """
+    name = config.MUNGED_HO_CUBE if name is None else name
+    return index_cube(read_munged_file(name))
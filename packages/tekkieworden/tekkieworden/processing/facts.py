@@ -0,0 +1,146 @@
+import logging
+import re
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tekkieworden.config import config
+from tekkieworden.processing.readers import read_munged_file
+from tekkieworden.processing.writers import write_df
+
+
+_logger = logging.getLogger(__name__)
+
+GENDERS = ["man", "vrouw", "tot"]
+MEASURES = list(config.STORE_MEASURES.values())
+# sorted index of the fact table: slicing a measure and gender is a range lookup
+FACT_INDEX = ["measure", "gender", "year", "opleiding_id"]
+
+
+def build_facts(input_df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Splits a wide munged dataset in a long fact table and a dimension table.
+    Every munged row becomes one opleiding (instelling x opleiding) in the
+    dimension table; its {year}_{gender}_{i|d} figures become fact rows.
+    :param input_df: munged pd.DataFrame, e.g. the HO tech file
+    :return: tuple of (facts with a sorted MultiIndex measure, gender, year,
+        opleiding_id and a count column, dimensions indexed by opleiding_id)
+    """
+    pattern = re.compile(config.MUNGED_FIGURE_REGEX)
+    figure_cols = [c for c in input_df.columns if pattern.match(str(c))]
+    parts = [pattern.match(c).groups() for c in figure_cols]
+
+    dims = input_df.drop(columns=figure_cols).reset_index(drop=True)
+    # lists (e.g. gemeentenummer_duo) are no dimensions to slice on
+    dims = dims[[
+        c for c in dims.columns
+        if not (dims[c].dtype == object and dims[c].map(lambda v: isinstance(v, (list, tuple))).any())
+    ]]
+    dims.index.name = "opleiding_id"
+
+    values = input_df[figure_cols].to_numpy(dtype="float64", na_value=np.nan)
+    rows, cols = np.nonzero(~np.isnan(values))
+    facts = pd.DataFrame(
+        {
+            "measure": pd.Categorical.from_codes(
+                np.array([MEASURES.index(config.STORE_MEASURES[p[2]]) for p in parts], dtype=np.int8)[cols]
+                if len(cols) else np.empty(0, dtype=np.int8),
+                categories=MEASURES,
+            ),
+            "gender": pd.Categorical.from_codes(
+                np.array([GENDERS.index(p[1]) for p in parts], dtype=np.int8)[cols]
+                if len(cols) else np.empty(0, dtype=np.int8),
+                categories=GENDERS,
+            ),
+            "year": np.array([int(p[0]) for p in parts], dtype=np.int16)[cols],
+            "opleiding_id": rows.astype(np.int32),
+            "count": values[rows, cols],
+        }
+    )
+    facts = facts.set_index(FACT_INDEX).sort_index()
+    _logger.info(f"{len(facts)} facts over {len(dims)} opleidingen")
+    return facts, dims
+
+
+def write_facts(facts_and_dims, facts_name=None, dims_name=None) -> List[str]:
+    """
+    :param facts_and_dims: tuple of (facts, dims) from build_facts
+    :return: list of written files
+    """
+    facts, dims = facts_and_dims
+    facts_name = config.MUNGED_HO_FACTS if facts_name is None else facts_name
+    dims_name = config.MUNGED_HO_DIMENSIONS if dims_name is None else dims_name
+    return write_df(facts.reset_index(), name=facts_name) + write_df(
+        dims.reset_index(), name=dims_name
+    )
+
+
+def read_facts(facts_name=None, dims_name=None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reads a fact table and its dimension table written by write_facts.
+    :return: tuple of (facts, dims) as returned by build_facts
+    """
+    facts_name = config.MUNGED_HO_FACTS if facts_name is None else facts_name
+    dims_name = config.MUNGED_HO_DIMENSIONS if dims_name is None else dims_name
+    facts = read_munged_file(facts_name)
+    facts["measure"] = pd.Categorical(facts["measure"], categories=MEASURES)
+    facts["gender"] = pd.Categorical(facts["gender"], categories=GENDERS)
+    facts = facts.set_index(FACT_INDEX)
+    if not facts.index.is_monotonic_increasing:
+        facts = facts.sort_index()
+    dims = read_munged_file(dims_name).set_index("opleiding_id").sort_index()
+    return facts, dims
+
+
+def pivot_years(
+    facts: pd.DataFrame,
+    dims: pd.DataFrame,
+    measure: str,
+    gender: str = "tot",
+    by: List[str] = None,
+    years: List[int] = None,
+) -> pd.DataFrame:
+    """
+    Sums the figures of one measure and gender per dimension value and year.
+    :param facts: fact table from build_facts / read_facts
+    :param dims: dimension table from build_facts / read_facts
+    :param measure: "ingeschrevenen" or "gediplomeerden"
+    :param gender: "man", "vrouw" or "tot"
+    :param by: dimension columns to group on, defaults to opleiding_id
+    :param years: only these years, defaults to all years of the measure
+    :return: pd.DataFrame indexed by the by columns with one column per year
+    """
+    block = facts.loc[(measure, gender), "count"]
+    if years is not None:
+        block = block.loc[list(years)]
+    year = block.index.get_level_values("year")
+    ids = block.index.get_level_values("opleiding_id")
+    if by is None:
+        keys = [pd.Index(ids, name="opleiding_id")]
+    else:
+        positions = dims.index.get_indexer(ids)
+        keys = [pd.Index(dims[c].to_numpy()[positions], name=c) for c in by]
+    table = block.groupby(keys + [year]).sum().unstack("year")
+    table.columns.name = "year"
+    return table
+
+
+def year_series(
+    facts: pd.DataFrame,
+    dims: pd.DataFrame,
+    measure: str,
+    gender: str = "tot",
+    by: List[str] = None,
+    years: List[int] = None,
+) -> pd.DataFrame:
+    """
+    pivot_years as long rows, e.g. for line charts.
+    :return: pd.DataFrame with the by columns, year and a column named measure
+    """
+    return (
+        pivot_years(facts, dims, measure, gender=gender, by=by, years=years)
+        .stack()
+        .rename(measure)
+        .reset_index()
+    )
@@ -0,0 +1,117 @@
+import logging
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from tekkieworden.processing.label_index import LabelIndex, normalize_label_key
+
+
+_logger = logging.getLogger(__name__)
+
+
+def trigrams(key: str) -> frozenset:
+    """
+    :return: character trigrams of a normalized name, padded so short words
+        and word boundaries produce grams too
+    """
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def tokens(key: str) -> frozenset:
+    return frozenset(key.split())
+
+
+class FuzzyLabelMatcher:
+    """
+    Proposes tech labels for names that are not in a LabelIndex, e.g.
+    opleidingen renamed in a new DUO release. Candidates are found through an
+    inverted trigram index (blocking), so a name is only scored against the
+    labelled names it shares rare trigrams with, never against all of them.
+    :param label_index: LabelIndex of the labelled names
+    :param max_df: trigrams occurring in more than this fraction of the names
+        are too common to block on
+    :param max_candidates: number of candidates per name that get scored
+    """
+
+    def __init__(self, label_index: LabelIndex, max_df=0.05, max_candidates=25):
+        self.label_index = label_index
+        self.keys = list(label_index.index)
+        self.labels = [label_index.index[k] for k in self.keys]
+        self.grams = [trigrams(k) for k in self.keys]
+        self.tokens = [tokens(k) for k in self.keys]
+        self.max_candidates = max_candidates
+
+        postings = defaultdict(list)
+        for i, grams in enumerate(self.grams):
+            for gram in grams:
+                postings[gram].append(i)
+        max_postings = max(1, int(max_df * len(self.keys)))
+        self.postings = {
+            gram: np.array(ids, dtype=np.int32)
+            for gram, ids in postings.items()
+            if len(ids) <= max_postings
+        }
+
+    def candidates(self, key: str) -> np.ndarray:
+        """
+        :return: ids of the labelled names sharing the most rare trigrams with key
+        """
+        lists = [self.postings[g] for g in trigrams(key) if g in self.postings]
+        if not lists:
+            return np.empty(0, dtype=np.int32)
+        counts = np.bincount(np.concatenate(lists), minlength=len(self.keys))
+        hits = np.flatnonzero(counts)
+        if len(hits) > self.max_candidates:
+            top = np.argpartition(-counts[hits], self.max_candidates)[: self.max_candidates]
+            hits = hits[top]
+        return hits
+
+    def score(self, key: str, ids) -> np.ndarray:
+        """
+        Average of trigram Dice and token Jaccard similarity, between 0 and 1.
+        """
+        grams, toks = trigrams(key), tokens(key)
+        scores = np.empty(len(ids))
+        for n, i in enumerate(ids):
+            dice = 2 * len(grams & self.grams[i]) / (len(grams) + len(self.grams[i]))
+            union = len(toks | self.tokens[i])
+            jaccard = len(toks & self.tokens[i]) / union if union else 0.0
+            scores[n] = (dice + jaccard) / 2
+        return scores
+
+    def propose(self, names: pd.Series, top_k=3, min_score=0.5) -> pd.DataFrame:
+        """
+        Scores every distinct name that is not in the label index.
+        :param names: pd.Series of names, e.g. opleidingsnaam_duo
+        :param top_k: number of candidates to propose per name
+        :param min_score: drop candidates scoring lower
+        :return: pd.DataFrame with name, candidate, candidate_label, score, rank
+        """
+        rows = []
+        for name in pd.unique(names.dropna()):
+            key = normalize_label_key(name)
+            if key in self.label_index.index:
+                continue
+            ids = self.candidates(key)
+            if not len(ids):
+                continue
+            scores = self.score(key, ids)
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            for rank, o in enumerate(order, start=1):
+                if scores[o] < min_score:
+                    break
+                rows.append(
+                    {
+                        "name": name,
+                        "candidate": self.keys[ids[o]],
+                        "candidate_label": self.labels[ids[o]],
+                        "score": round(float(scores[o]), 3),
+                        "rank": rank,
+                    }
+                )
+        _logger.info(f"{len(rows)} label candidates proposed")
+        return pd.DataFrame(
+            rows, columns=["name", "candidate", "candidate_label", "score", "rank"]
+        )
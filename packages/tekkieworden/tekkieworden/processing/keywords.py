@@ -0,0 +1,70 @@
+import re
+from functools import lru_cache
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class KeywordMatcher:
+    """
+    Matches a set of keywords with one precompiled, case-insensitive regex.
+    Longer keywords are tried first so 'data science' wins over 'data'.
+    :param keywords: list of keyword strings, duplicates are ignored
+    """
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = sorted({k.lower() for k in keywords}, key=lambda k: (-len(k), k))
+        self.pattern = re.compile(
+            "|".join(re.escape(k) for k in self.keywords), flags=re.IGNORECASE
+        )
+
+    def find(self, text) -> List[str]:
+        """
+        :return: lowercased matches in text, empty for missing values
+        """
+        if not isinstance(text, str) or not self.keywords:
+            return []
+        return [m.lower() for m in self.pattern.findall(text)]
+
+    def match_columns(self, input_df: pd.DataFrame, cols: List[str], prefix="tech_keyword") -> pd.DataFrame:
+        """
+        Scans all columns in a single pass: the values of every column are
+        factorized together, so each distinct text is searched only once.
+        :param input_df: pd.DataFrame
+        :param cols: columns to search
+        :param prefix: name of the merged column, per column results get a _<col> suffix
+        :return: pd.DataFrame with a ', '-joined string of matches per column and
+            a merged column with the unique matches over all columns, in order
+        """
+        stacked = pd.concat(
+            [input_df[c].astype(object) for c in cols], ignore_index=True
+        )
+        codes, uniques = pd.factorize(stacked)
+        found = [self.find(text) for text in uniques] + [[]]  # code -1 -> no match
+        codes = codes.reshape(len(cols), len(input_df)).T
+
+        result = pd.DataFrame(index=input_df.index)
+        joined = np.array([", ".join(f) for f in found], dtype=object)
+        for i, col in enumerate(cols):
+            result[f"{prefix}_{col}"] = joined[codes[:, i]]
+
+        combos, inverse = np.unique(codes, axis=0, return_inverse=True)
+        merged = np.array(
+            [", ".join(dict.fromkeys(k for code in combo for k in found[code])) for combo in combos],
+            dtype=object,
+        )
+        result[prefix] = merged[np.asarray(inverse).ravel()] if len(combos) else []
+        return result
+
+
+@lru_cache(maxsize=8)
+def _matcher(keywords: tuple) -> KeywordMatcher:
+    return KeywordMatcher(list(keywords))
+
+
+def get_matcher(keywords: List[str]) -> KeywordMatcher:
+    """
+    :return: KeywordMatcher, compiled once per keyword list
+    """
+    return _matcher(tuple(keywords))
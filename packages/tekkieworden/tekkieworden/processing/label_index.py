@@ -0,0 +1,111 @@
+import logging
+import os
+import pickle
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from tekkieworden.config import config
+from tekkieworden.processing.readers import open_tech_label_yaml
+
+
+_logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# in-process cache: yaml path -> ((mtime_ns, size), LabelIndex)
+_loaded = {}
+
+
+def normalize_label_key(name) -> str:
+    """
+    Normalizes an opleidingsnaam for lookups: unicode NFKC, casefolded and
+    with whitespace collapsed, so 'Data  Science ' matches 'data science'.
+    """
+    if not isinstance(name, str):
+        return None
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", name)).strip().casefold()
+
+
+class LabelIndex:
+    """
+    Lookup table of normalized opleidingsnaam -> tech label.
+    :param labels: dict of opleidingsnaam -> label, e.g. the "tech" mapping of
+        ho_tech_labels.yml
+    """
+
+    def __init__(self, labels: dict):
+        self.index = {}
+        for name, label in labels.items():
+            key = normalize_label_key(name)
+            if key in self.index and self.index[key] != label:
+                _logger.warning(
+                    f"'{name}' normalizes to '{key}' which is already labelled "
+                    f"'{self.index[key]}', ignoring label '{label}'"
+                )
+                continue
+            self.index.setdefault(key, label)
+        self.categories = sorted(set(self.index.values()))
+
+    def __len__(self):
+        return len(self.index)
+
+    def lookup(self, series: pd.Series, default="no_tech") -> pd.Series:
+        """
+        Labels a column by normalizing only its unique values and joining the
+        codes against the index.
+        :param series: pd.Series of names
+        :param default: label for names that are not in the index
+        :return: categorical pd.Series of labels
+        """
+        codes, uniques = pd.factorize(series)
+        labels = [self.index.get(normalize_label_key(u), default) for u in uniques]
+        categories = list(dict.fromkeys(self.categories + [default]))
+        label_codes = np.array(
+            [categories.index(label) for label in labels] + [categories.index(default)],
+            dtype=np.int32,
+        )
+        return pd.Series(
+            pd.Categorical.from_codes(label_codes[codes], categories=categories),
+            index=series.index,
+            name=series.name,
+        )
+
+
+def load_label_index(yaml_file, label_key="tech") -> LabelIndex:
+    """
+    Loads the LabelIndex of a tech_label yaml in the config dir. The index is
+    pickled to config.PATH_TO_CACHE and only rebuilt when the yaml's mtime or
+    size changes.
+    :param yaml_file: name of the yaml file, e.g. "ho_tech_labels.yml"
+    :param label_key: top-level key of the mapping in the yaml
+    :return: LabelIndex
+    """
+    source = os.path.join(str(config.PATH_TO_CONFIG), yaml_file)
+    stat = os.stat(source)
+    version = (stat.st_mtime_ns, stat.st_size, label_key)
+
+    cached = _loaded.get(source)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    pickled = os.path.join(str(config.PATH_TO_CACHE), f"{yaml_file}.label_index.pkl")
+    index = None
+    if os.path.exists(pickled):
+        with open(pickled, "rb") as f:
+            pickled_version, index = pickle.load(f)
+        if pickled_version != version:
+            index = None
+
+    if index is None:
+        _logger.info(f"Building label index from {yaml_file}")
+        index = LabelIndex(open_tech_label_yaml(yaml_file=yaml_file)[label_key])
+        os.makedirs(str(config.PATH_TO_CACHE), exist_ok=True)
+        with open(pickled + ".part", "wb") as f:
+            pickle.dump((version, index), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(pickled + ".part", pickled)
+
+    _loaded[source] = (version, index)
+    return index
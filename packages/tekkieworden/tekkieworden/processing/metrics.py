@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import List
+
+import pandas as pd
+
+from tekkieworden.processing.utilities import JoinReport
+
+
+_logger = logging.getLogger(__name__)
+
+# stack of active collectors, the innermost one receives the records
+_active = []
+
+
+class MetricsCollector:
+    """
+    Collects structured join-quality and timing records of a munge run, so
+    regressions between DUO releases show up in a run report instead of in
+    free-text log lines.
+    :param stage: name of the pipeline stage the records belong to
+    """
+
+    def __init__(self, stage=None):
+        self.stage = stage
+        self.records = []
+        self._reports = []
+
+    def join_report(self, name) -> JoinReport:
+        """
+        :param name: name of the join, e.g. "duo_sdb"
+        :return: JoinReport to pass to a join in utilities; it is recorded
+            when the collector is read
+        """
+        report = JoinReport(name=name)
+        self._reports.append(report)
+        return report
+
+    def record(self, kind, name, **values):
+        """
+        :param kind: type of record, e.g. "dropped" or "stage"
+        :param name: what was measured
+        :param values: measured values
+        """
+        self._flush_reports()
+        self.records.append(dict({"stage": self.stage, "kind": kind, "name": name}, **values))
+
+    def extend(self, records: List[dict]):
+        self._flush_reports()
+        self.records.extend(records)
+
+    def as_records(self) -> List[dict]:
+        self._flush_reports()
+        return list(self.records)
+
+    def _flush_reports(self):
+        for report in self._reports:
+            self.records.append(dict({"stage": self.stage, "kind": "join"}, **report.as_dict()))
+        self._reports = []
+
+    def write(self, destination) -> str:
+        """
+        Writes the run report as json, or as parquet when destination ends with
+        .parquet (nested values are stored as json strings there).
+        :param destination: path of the report
+        :return: destination
+        """
+        records = self.as_records()
+        os.makedirs(os.path.dirname(str(destination)), exist_ok=True)
+        if str(destination).endswith(".parquet"):
+            df = pd.DataFrame(records)
+            for col in df.columns[df.dtypes == object]:
+                if df[col].map(lambda v: isinstance(v, (list, dict))).any():
+                    df[col] = df[col].map(json.dumps)
+            df.to_parquet(str(destination), index=False)
+        else:
+            with open(str(destination), "w") as f:
+                json.dump(records, f, indent=2, default=str)
+        _logger.info(f"Wrote {len(records)} metrics records to {destination}")
+        return str(destination)
+
+
+def current() -> MetricsCollector:
+    """
+    :return: the active MetricsCollector, None outside of collecting()
+    """
+    return _active[-1] if _active else None
+
+
+def join_report(name) -> JoinReport:
+    """
+    :return: a JoinReport registered with the active collector, None when no
+        collector is active so joins skip their diagnostics
+    """
+    collector = current()
+    return collector.join_report(name) if collector is not None else None
+
+
+def record(kind, name, **values):
+    """
+    Adds a record to the active collector, a no-op when none is active.
+    """
+    collector = current()
+    if collector is not None:
+        collector.record(kind, name, **values)
+
+
+@contextmanager
+def collecting(stage=None):
+    """
+    Activates a MetricsCollector for the duration of the block.
+    """
+    collector = MetricsCollector(stage=stage)
+    _active.append(collector)
+    try:
+        yield collector
+    finally:
+        _active.remove(collector)
+
+
+@contextmanager
+def timed(kind, name, **values):
+    """
+    Records the wall time of the block with the active collector.
+    :return: dict of the recorded values, seconds is set when the block ends
+    """
+    values = {"seconds": None, **values}
+    start = time.perf_counter()
+    yield values
+    values["seconds"] = time.perf_counter() - start
+    record(kind, name, **values)
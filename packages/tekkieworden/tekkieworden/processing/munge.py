@@ -1,17 +1,30 @@
+import argparse
 import logging
 import pandas as pd
 import numpy as np
 import os
-import re
-import pandas_profiling as pdp
 
+from datetime import datetime
+from functools import partial
 from typing import List
 
-from tekkieworden.config import config
-from tekkieworden.processing.readers import open_tech_label_yaml
-from tekkieworden.processing.writers import write_df_csv, write_ho_techlabel_excel_to_yaml, \
+from tekkieworden.config import config, schemas
+from tekkieworden.processing.readers import read_excel_snapshot, excel_snapshot_columns, \
+    read_duo_csv, detect_ho_duo_type
+from tekkieworden.processing.writers import write_df, write_df_csv, munged_path, write_ho_techlabel_excel_to_yaml, \
     write_mbo_techlabel_excel_to_yaml
 from tekkieworden.processing.utilities import pandas_join_key_dual, pandas_join_on_index
+from tekkieworden.processing import metrics
+from tekkieworden.processing.cube import build_cube
+from tekkieworden.processing.facts import build_facts, write_facts
+from tekkieworden.processing.fuzzy import FuzzyLabelMatcher
+from tekkieworden.processing.keywords import get_matcher
+from tekkieworden.processing.label_index import load_label_index
+from tekkieworden.processing.normalize import normalize_codes, lower, strip_first_word, to_categories, \
+    mbo_column_mapping
+from tekkieworden.processing.pipeline import Pipeline, Stage
+from tekkieworden.processing.pivot import combine_sums, group_sum, pivot_gender
+from tekkieworden.processing.store import ingest_release, partition_path
 
 
 _logger = logging.getLogger()
@@ -29,21 +42,34 @@ def prepare_sdb_opleidingen_file(
     :param data_quality_report: generates and stores a Pandas profiling report
     :return: formatted SDB file
     """
-    df = pd.read_excel(os.path.join(str(path), file), sheet_name="Opleidingen")
-
     if data_quality_report:
+        df = read_excel_snapshot(path=path, file=file, sheet_name="Opleidingen")
 
         logging.info(
             f"Generating Data quality report. Storing : {config.PATH_TO_DATA_QUALITY_REPORT}"
         )
+        # heavy import, only needed for the report
+        import pandas_profiling as pdp
+
         sdb_profile_report = pdp.ProfileReport(df)
         sdb_profile_report.to_file(
-            config.PATH_TO_DATA_QUALITY_REPORT + "sdb_data_quality_report.html"
+            os.path.join(str(config.PATH_TO_DATA_QUALITY_REPORT), "sdb_data_quality_report.html")
+        )
+        logging.info(f"dropping columns: \n {config.drop_studiekeuze_cols}")
+        df = df.drop(columns=config.drop_studiekeuze_cols)
+    else:
+        logging.info(f"skip reading columns: \n {config.drop_studiekeuze_cols}")
+        drop_cols = set(config.drop_studiekeuze_cols)
+        all_cols = excel_snapshot_columns(path=path, file=file, sheet_name="Opleidingen")
+        missing = drop_cols.difference(all_cols)
+        if missing:
+            raise KeyError(f"{sorted(missing)} not found in {file}")
+        df = read_excel_snapshot(
+            path=path,
+            file=file,
+            sheet_name="Opleidingen",
+            columns=[c for c in all_cols if c not in drop_cols],
         )
-
-    logging.info(f"dropping columns: \n {config.drop_studiekeuze_cols}")
-    for col in config.drop_studiekeuze_cols:
-        df = df.drop(col, axis=1)
     df.columns = df.columns.str.lower()
     # check with Tekkieworden
     # logging.info(f"putting filter on:{df.actieveopleiding.name} == 1.0")
@@ -53,9 +79,9 @@ def prepare_sdb_opleidingen_file(
 
     str_cols = ["brinnummer_sdb", "opleidingscode_sdb", "opleiding_sk123id_sdb"]
     for col in str_cols:
-        df[col] = df[col].astype(str)
-    df["soortopleiding_sdb"] = df["soortopleiding_sdb"].str.lower()  # like in DUO file
-    df["soortho_sdb"] = df["soortho_sdb"].apply(lambda x: x.lower())  # like in DUO file
+        df[col] = normalize_codes(df[col]).astype(str)
+    for col in ["soortopleiding_sdb", "soortho_sdb"]:
+        df[col] = lower(df[col]).astype(object)  # like in DUO file
 
     # cat opleidingsvormen into one column
     df["opleidingsvorm_sdb"] = np.where(
@@ -63,8 +89,7 @@ def prepare_sdb_opleidingen_file(
         "voltijd onderwijs",
         (np.where(df.deeltijd_sdb == 1, "deeltijd onderwijs", "duaal onderwijs")),
     )
-    for col in ["voltijd_sdb", "deeltijd_sdb", "duaal_sdb"]:
-        df = df.drop(col, axis=1)
+    df = df.drop(columns=["voltijd_sdb", "deeltijd_sdb", "duaal_sdb"])
 
     logging.info(f"Studiekeuze opleidingen frame shape: {df.shape}")
     # logging.info(f'Extract \n: {df.head(5)}')
@@ -72,18 +97,21 @@ def prepare_sdb_opleidingen_file(
     return df
 
 
-def prepare_duo_ho_files(path, file: str, ho_type: str) -> pd.DataFrame:
+def prepare_duo_ho_files(path, file: str, ho_type: str, duo_type: str = None) -> pd.DataFrame:
     """
     Reads in and formats DUO files
     :param path: path to DUO file
     :param file: name of Duo file
     :param ho_type: hbo or wo. Adds adequate column to dataset
+    :param duo_type: schema to read the file with, e.g. "hbo_i". Detected from
+        the header when not given, raises ValueError if no schema matches
     :return: formatted DUO file
     """
-    df = pd.read_csv(os.path.join(str(path), file), sep=";")
+    if duo_type is None:
+        duo_type = detect_ho_duo_type(path, file, ho_type)
+    # gemeentenaam and soort_instelling are not read, codes are parsed as strings
+    df = read_duo_csv(path=path, file=file, duo_type=duo_type)
     df.columns = df.columns.str.lower().str.replace(" ", "_")
-    for c in ["gemeentenummer", "opleidingscode_actueel"]:
-        df[c] = df[c].map("{:.0f}".format).astype(str)
 
     empty_col_name = "brin_nummer_actueel"
     logging.info(
@@ -91,11 +119,6 @@ def prepare_duo_ho_files(path, file: str, ho_type: str) -> pd.DataFrame:
     )
     df = df.dropna(subset=["brin_nummer_actueel"], how="any")
 
-    drop_cols = ["gemeentenaam", "soort_instelling"]
-    logging.info(f"Dropping columns: {drop_cols}")
-    for col in drop_cols:
-        df = df.drop(col, axis=1)
-
     rename_column_dict = {
         "provincie": "provincie_duo",
         "gemeentenummer": "gemeentenummer_duo",
@@ -111,10 +134,9 @@ def prepare_duo_ho_files(path, file: str, ho_type: str) -> pd.DataFrame:
     logging.info(f"Renaming columns: {rename_column_dict}")
     df = df.rename(columns=rename_column_dict)
 
-    df.brinnummer_duo = df.brinnummer_duo.astype(str)
-
-    regex_pattern = "\s(.*)"  # extract string after first whitespace
-    df["opleidingsnaam_duo"] = df["opleidingsnaam_duo"].str.extract(regex_pattern)
+    # extract string after first whitespace, computed once per unique name
+    df["opleidingsnaam_duo"] = strip_first_word(df["opleidingsnaam_duo"])
+    df = to_categories(df, ["instellingsnaam_duo", "opleidingsnaam_duo"])
 
     logging.info(f"Adding column: {ho_type}")
     df[f"ho_type"] = ho_type
@@ -123,31 +145,6 @@ def prepare_duo_ho_files(path, file: str, ho_type: str) -> pd.DataFrame:
     return df
 
 
-def add_total_columns(input_df):
-    year_figure_regex = "\d"  # 2015, ..
-    year_figure_cols = input_df.filter(
-        regex=year_figure_regex, axis=1
-    ).columns.values.tolist()
-    numeric_chars = np.unique([re.sub("[^0-9]", "", x) for x in year_figure_cols])
-
-    for y in numeric_chars:
-        filter_cols = input_df.filter(regex=y, axis=1).columns
-        input_df[f"{y}_tot"] = input_df[filter_cols].sum(axis=1)
-
-    return input_df
-
-
-def rename_digit_cols(input_df, underscore):
-    year_figure_regex = "\d"  # 2015, ...
-    year_figure_cols = input_df.filter(
-        regex=year_figure_regex, axis=1
-    ).columns.values.tolist()
-    rename_dict = {x: x + underscore for x in year_figure_cols}
-    input_df = input_df.rename(columns=rename_dict)
-
-    return input_df
-
-
 def unstack_duo_ho_files(ho_type) -> pd.DataFrame:
     text_intro = "There is a discrepancy between DUO files <gediplomeerden> file and DUO <ingeschrevenen>. Duo_d file are not as up-to-date and contain different opleidingen. \
 We make the <ingeschrevenen> file and the opleidingscodes it contains leading."
@@ -156,20 +153,20 @@ We make the <ingeschrevenen> file and the opleidingscodes it contains leading."
     if ho_type == "hbo":
         # ingeschrevenen
         file_i = prepare_duo_ho_files(
-            path=config.PATH_TO_RAW_DATA, file=config.DUO_HBO_I_CSV, ho_type="hbo"
+            path=config.PATH_TO_RAW_DATA, file=config.DUO_HBO_I_CSV, ho_type="hbo", duo_type="hbo_i"
         )
         # gediplomeerden
         file_d = prepare_duo_ho_files(
-            path=config.PATH_TO_RAW_DATA, file=config.DUO_HBO_D_CSV, ho_type="hbo"
+            path=config.PATH_TO_RAW_DATA, file=config.DUO_HBO_D_CSV, ho_type="hbo", duo_type="hbo_d"
         )
     elif ho_type == "wo":
         # ingeschrevenen
         file_i = prepare_duo_ho_files(
-            path=config.PATH_TO_RAW_DATA, file=config.DUO_WO_I_CSV, ho_type="wo"
+            path=config.PATH_TO_RAW_DATA, file=config.DUO_WO_I_CSV, ho_type="wo", duo_type="wo_i"
         )
         # gediplomeerden
         file_d = prepare_duo_ho_files(
-            path=config.PATH_TO_RAW_DATA, file=config.DUO_WO_D_CSV, ho_type="wo"
+            path=config.PATH_TO_RAW_DATA, file=config.DUO_WO_D_CSV, ho_type="wo", duo_type="wo_d"
         )
 
     unique_opleidingen_i = file_i.opleidingscode_duo.unique().tolist()
@@ -183,6 +180,10 @@ We make the <ingeschrevenen> file and the opleidingscodes it contains leading."
         .tolist()
     )
     logging.info(f"{text_intro} {text_warning} {drop_opleidingen_d}")
+    metrics.record(
+        "dropped", f"{ho_type}_opleidingen_d",
+        count=len(drop_opleidingen_d), names=drop_opleidingen_d,
+    )
 
     file_d = file_d[file_d.opleidingscode_duo.isin(unique_opleidingen_i)]
 
@@ -204,20 +205,15 @@ We make the <ingeschrevenen> file and the opleidingscodes it contains leading."
         "opleidingsnaam_duo",
         "ho_type",
         "soortopleiding_duo",
-        "geslacht",
     ]
 
-    file_i_agg = (
-        file_i.groupby(groupby_cols)[year_figure_cols].sum().unstack("geslacht")
+    file_i_agg = pivot_gender(
+        file_i, keys=groupby_cols, year_cols=year_figure_cols, suffix="_i"
     )
-    file_i_agg.columns = ["_".join(col).strip() for col in file_i_agg.columns.values]
     file_i_agg = file_i_agg.reset_index(drop=False).set_index(
         ["brinnummer_duo", "opleidingscode_duo"]
     )
 
-    file_i_agg = add_total_columns(input_df=file_i_agg)
-    file_i_agg = rename_digit_cols(input_df=file_i_agg, underscore="_i")
-
     # File gedlipomeerden
     year_figure_cols = file_d.filter(
         regex=year_figure_regex, axis=1
@@ -226,23 +222,20 @@ We make the <ingeschrevenen> file and the opleidingscodes it contains leading."
     groupby_cols = [
         "brinnummer_duo",
         "opleidingscode_duo",
-        "geslacht",
     ]
 
-    file_d_agg = (
-        file_d.groupby(groupby_cols)[year_figure_cols].sum().unstack("geslacht")
+    file_d_agg = pivot_gender(
+        file_d, keys=groupby_cols, year_cols=year_figure_cols, suffix="_d"
     )
-    file_d_agg.columns = ["_".join(col).strip() for col in file_d_agg.columns.values]
-
-    file_d_agg = add_total_columns(input_df=file_d_agg)
-    file_d_agg = rename_digit_cols(input_df=file_d_agg, underscore="_d")
 
     file_i_agg = pandas_join_on_index(
-        left_df=file_i_agg, right_df=file_d_agg, how="left"
+        left_df=file_i_agg, right_df=file_d_agg, how="left",
+        report=metrics.join_report(f"{ho_type}_i_d"),
     ).reset_index()
 
     file_i_agg = pandas_join_on_index(
-        left_df=file_i_agg.set_index("brinnummer_duo"), right_df=gemeentes, how="left"
+        left_df=file_i_agg.set_index("brinnummer_duo"), right_df=gemeentes, how="left",
+        report=metrics.join_report(f"{ho_type}_gemeentes"),
     ).reset_index()
 
     return file_i_agg
@@ -296,16 +289,19 @@ def merge_duo_sdb_files(duo_file, sdb_file) -> pd.DataFrame:
         left_key=["brinnummer_duo", "opleidingscode_duo"],
         right_key=sdb_join_cols,
         how="left",
+        report=metrics.join_report("duo_sdb"),
     )
     df = df.drop(sdb_join_cols, axis=1)
 
     fill_cols = ["studentenaantal_sdb", "eerstejaarsaantal_sdb"]
     logging.info(f"Filling : {fill_cols} with data from duo_file when data is missing")
+    # the studiekeuze figures are one year behind the DUO release
+    duo_col = f"{config.FILE_YEAR - 1}_tot_i"
     df.loc[df.studentenaantal_sdb.isnull(), fill_cols] = df.loc[
-        df.studentenaantal_sdb.isnull(), "2018_tot_i"
+        df.studentenaantal_sdb.isnull(), duo_col
     ]
-    df.loc[df["2018_tot_i"].isnull(), "2018_tot_i"] = df.loc[
-        df["2018_tot_i"].isnull(), "eerstejaarsaantal_sdb"
+    df.loc[df[duo_col].isnull(), duo_col] = df.loc[
+        df[duo_col].isnull(), "eerstejaarsaantal_sdb"
     ]
 
     logging.info(
@@ -324,13 +320,16 @@ def merge_duo_sdb_files(duo_file, sdb_file) -> pd.DataFrame:
     return df
 
 
-def tag_tech_studies(input_df: pd.DataFrame, tech_keywords=List[str]) -> pd.DataFrame:
+def tag_tech_studies(input_df: pd.DataFrame, tech_keywords: List[str] = None,
+                     per_column=False) -> pd.DataFrame:
     """
     create a tech keywords column based on a tech_keywords list in config file
     :param input_df:
-    :param tech_keywords: list of tech keyword strings
+    :param tech_keywords: list of tech keyword strings, defaults to config.tech_keywords
+    :param per_column: also add a tech_keyword_<col> column per searched column
     :return: pd.DataFrame with additional tech_keyword column to filter on
     """
+    tech_keywords = config.tech_keywords if tech_keywords is None else tech_keywords
     cols_to_check = [
         "opleidingsnaam_duo",
         "croho_onderdeel_duo",
@@ -340,30 +339,48 @@ def tag_tech_studies(input_df: pd.DataFrame, tech_keywords=List[str]) -> pd.Data
     ]
 
     logging.info(f"Searching for tech keywords in : {cols_to_check}")
-    for c in cols_to_check:
-        input_df["tech_keyword"] = input_df[c].str.findall(
-            r"|".join(config.tech_keywords), flags=re.IGNORECASE
-        )
-    input_df["tech_keyword"] = input_df.tech_keyword.apply(", ".join)
-    input_df["tech_keyword"] = input_df["tech_keyword"].apply(lambda x: x.lower())
+    matches = get_matcher(tech_keywords).match_columns(input_df, cols_to_check)
+    if not per_column:
+        matches = matches[["tech_keyword"]]
+    for col in matches.columns:
+        input_df[col] = matches[col]
 
     return input_df
 
 
 def label_tech_studies(input_df: pd.DataFrame, yaml_file, label_col:str) -> pd.DataFrame:
     """
-    create a tech_label column based on a mapping in the tech_label.yml
+    create a tech_label column based on a mapping in the tech_label.yml.
+    Names are matched case- and whitespace-insensitive
     :param input_df: pd.Dataframe
+    :param yaml_file: name of the tech_label yaml in the config dir
+    :param label_col: column holding the names to label
     :return: pd.DataFrame with additional tech_label column to filter on
     """
-    tech_label_dict = open_tech_label_yaml(yaml_file=yaml_file)["tech"]
-    input_df["tech_label"] = input_df[label_col].map(tech_label_dict)
-    # tricky CHECK with TEKKIEWORDEN!
-    input_df["tech_label"] = input_df["tech_label"].fillna("no_tech")
+    # tricky CHECK with TEKKIEWORDEN! unknown names are labelled no_tech
+    input_df["tech_label"] = load_label_index(yaml_file=yaml_file).lookup(
+        input_df[label_col], default="no_tech"
+    )
 
     return input_df
 
 
+def write_label_candidates(input_df: pd.DataFrame, label_col: str, yaml_file, filename):
+    """
+    Proposes tech labels for names missing from the tech_label yaml and writes
+    them to a review csv in the munged data folder.
+    :param input_df: pd.DataFrame with the names to label
+    :param label_col: column holding the names
+    :param yaml_file: name of the tech_label yaml in the config dir
+    :param filename: name of the review csv
+    :return: pd.DataFrame with the candidates
+    """
+    matcher = FuzzyLabelMatcher(load_label_index(yaml_file=yaml_file))
+    candidates = matcher.propose(input_df[label_col])
+    write_df_csv(input_df=candidates, filename=filename)
+    return candidates
+
+
 def filter_tech_studies(input_df: pd.DataFrame) -> pd.DataFrame:
     """
     Filter the prepared duo, sdb file on tech studies using either the tech_label
@@ -379,90 +396,282 @@ def filter_tech_studies(input_df: pd.DataFrame) -> pd.DataFrame:
 def unstack_duo_mbo_files(input_df):
     agg_cols = input_df.filter(regex='\d', axis=1).columns.tolist()
     groupby_cols = ['brin_nummer', 'kwalificatie_code', 'kwalificatie_naam']
-    agg = input_df.groupby(groupby_cols)[agg_cols].sum()
+    agg = group_sum(input_df, keys=groupby_cols, value_cols=agg_cols)
     logging.info(f"dataframe shape: {agg.shape}")
 
     return agg
 
 
+def aggregate_mbo_file(file: str, duo_type: str, chunksize=None) -> pd.DataFrame:
+    """
+    Reads a DUO MBO file in blocks and sums every block per kwalificatie
+    before combining the partial sums, so memory is bounded by the number of
+    groups instead of the number of rows.
+    :param file: name of the DUO MBO file
+    :param duo_type: "mbo_i" or "mbo_d"
+    :param chunksize: rows per block, defaults to config.MBO_CHUNKSIZE
+    :return: pd.DataFrame as returned by unstack_duo_mbo_files, with
+        {year}_{man|vrouw|tot}_{i|d} columns
+    """
+    chunksize = config.MBO_CHUNKSIZE if chunksize is None else chunksize
+    chunks = read_duo_csv(
+        path=config.PATH_TO_RAW_DATA, file=file, duo_type=duo_type, chunksize=chunksize
+    )
+    agg, rows = None, 0
+    for chunk in chunks:
+        rows += len(chunk)
+        chunk = chunk.rename(columns=mbo_column_mapping(tuple(chunk.columns)))
+        partial_agg = unstack_duo_mbo_files(input_df=chunk)
+        agg = partial_agg if agg is None else combine_sums(agg, partial_agg)
+    if agg is None:
+        # a header without rows yields no chunks, aggregate the empty file
+        empty = read_duo_csv(path=config.PATH_TO_RAW_DATA, file=file, duo_type=duo_type)
+        empty = empty.rename(columns=mbo_column_mapping(tuple(empty.columns)))
+        agg = unstack_duo_mbo_files(input_df=empty)
+    logging.info(f"{file}: aggregated {rows} rows to {len(agg)} groups")
+    return agg.sort_index()
+
+
 def munge_mbo_files():
     """
     prepare the mbo duo files
-    :return: pd.DataFrame
+    :return: pd.DataFrame of all kwalificaties with a tech_label column,
+        filter_tech_studies keeps the tech ones
     """
     logging.info("prepare mbo file ingeschrevenen")
-    mbo_i = pd.read_csv(str(config.PATH_TO_RAW_DATA) + '/' + config.DUO_MBO_I_CSV, sep=';')
-    mbo_i.columns = mbo_i.columns.str.lower().str.replace(" ", "_")
-    mbo_rename_i_dict = {'man2015': '2015_man_i',
-                         'vrouw2015': '2015_vrouw_i',
-                         'totaal2015': '2015_tot_i',
-                         'man2016': '2016_man_i',
-                         'vrouw2016': '2016_vrouw_i',
-                         'totaal2016': '2016_tot_i',
-                         'man2017': '2017_man_i',
-                         'vrouw2017': '2017_vrouw_i',
-                         'totaal2017': '2017_tot_i',
-                         'man2018': '2018_man_i',
-                         'vrouw2018': '2018_vrouw_i',
-                         'totaal2018': '2018_tot_i',
-                         'man2019': '2019_man_i',
-                         'vrouw2019': '2019_vrouw_i',
-                         'totaal2019': '2019_tot_i'}
-    mbo_i = mbo_i.rename(columns=mbo_rename_i_dict)
+    mbo_i_agg = aggregate_mbo_file(config.DUO_MBO_I_CSV, "mbo_i")
 
-    logging.info("prepare mbo file ingeschrevenen")
-    mbo_d = pd.read_csv(str(config.PATH_TO_RAW_DATA) + '/' + config.DUO_MBO_D_CSV, sep=';')
-    mbo_d.columns = mbo_d.columns.str.lower().str.replace(" ", "_")
-    mbo_rename_d_dict = {'dipman2015': '2015_man_d',
-                         'dipvrw2015': '2015_vrouw_d',
-                         'diptotaal2015': '2015_tot_d',
-                         'dipman2016': '2016_man_d',
-                         'dipvrw2016': '2016_vrouw_d',
-                         'diptotaal2016': '2016_tot_d',
-                         'dipman2017': '2017_man_d',
-                         'dipvrw2017': '2017_vrouw_d',
-                         'diptotaal2017': '2017_tot_d',
-                         'dipman2018': '2018_man_d',
-                         'dipvrw2018': '2018_vrouw_d',
-                         'diptotaa2018l': '2018_tot_d',
-                         'dipman2019': '2019_man_d',
-                         'dipvrw2019': '2019_vrouw_d',
-                         'diptotaal2019': '2019_tot_d'}
-    mbo_d = mbo_d.rename(columns=mbo_rename_d_dict)
-
-    mbo_i_agg = unstack_duo_mbo_files(input_df=mbo_i)
-    mbo_d_agg = unstack_duo_mbo_files(input_df=mbo_d)
-
-    df = pandas_join_on_index(left_df=mbo_i_agg, right_df=mbo_d_agg, how='left').reset_index()
-    df = label_tech_studies(input_df=df, yaml_file='mbo_tech_labels.yml', label_col='kwalificatie_naam')
+    logging.info("prepare mbo file gediplomeerden")
+    mbo_d_agg = aggregate_mbo_file(config.DUO_MBO_D_CSV, "mbo_d")
 
-    df = df.query("tech_label != 'no_tech'")
+    df = pandas_join_on_index(
+        left_df=mbo_i_agg, right_df=mbo_d_agg, how='left', validate='one_to_one',
+        report=metrics.join_report("mbo_i_d"),
+    ).reset_index()
+    df = label_tech_studies(input_df=df, yaml_file='mbo_tech_labels.yml', label_col='kwalificatie_naam')
 
     return df
 
 
-def main():
-    write_ho_techlabel_excel_to_yaml(
-        input_df=str(config.PATH_TO_RAW_DATA) + "/cluster_ho_tech_labeling.xlsx",
-        filename="ho_tech_labels.yml")
-    write_mbo_techlabel_excel_to_yaml(
-        input_df=str(config.PATH_TO_RAW_DATA) + "/cluster_mbo_tech_labeling.xlsx",
-        filename="mbo_tech_labels.yml")
-    # ho file preparation
-    sdb_file = prepare_sdb_opleidingen_file(
-        path=config.PATH_TO_RAW_DATA, file=config.SDB_FILE, data_quality_report=None)
-    hbo = unstack_duo_ho_files(ho_type="hbo")
-    wo = unstack_duo_ho_files(ho_type="wo")
-    duo_file = concat_hbo_wo(hbo_input_df=hbo, wo_input_df=wo)
-    df = merge_duo_sdb_files(duo_file=duo_file, sdb_file=sdb_file)
-    df = tag_tech_studies(input_df=df, tech_keywords=config.tech_keywords)
-    df = label_tech_studies(input_df=df, yaml_file='ho_tech_labels.yml', label_col='opleidingsnaam_duo')
-    write_df_csv(input_df=df, filename="opleidingen_total_munged.csv")
-    tech_filtered_df = filter_tech_studies(input_df=df)
-    write_df_csv(input_df=tech_filtered_df, filename="opleidingen_ho_tech_filtered.csv")
-    # mbo file preparation
-    mbo = munge_mbo_files()
-    write_df_csv(input_df=mbo, filename="opleidingen_mbo_tech_filtered.csv")
+def _munged_outputs(name) -> List[str]:
+    outputs = [munged_path(name)]
+    if config.MUNGED_EXPORT_CSV:
+        outputs.append(munged_path(name, fmt="csv"))
+    return outputs
+
+
+def build_pipeline(cache_dir=None) -> Pipeline:
+    """
+    The munge steps as a DAG of named stages. Stages only rerun when their
+    input files, the config they read or an upstream stage changed.
+    :param cache_dir: directory for stage outputs, defaults to config.PATH_TO_CACHE
+    :return: Pipeline
+    """
+    raw = config.PATH_TO_RAW_DATA
+    ho_labels_xlsx = raw / "cluster_ho_tech_labeling.xlsx"
+    mbo_labels_xlsx = raw / "cluster_mbo_tech_labeling.xlsx"
+    # read by the labelling stages, listed as inputs so hand edits rerun them
+    ho_labels_yaml = config.PATH_TO_CONFIG / "ho_tech_labels.yml"
+    mbo_labels_yaml = config.PATH_TO_CONFIG / "mbo_tech_labels.yml"
+
+    stages = [
+        Stage(
+            "ho_tech_labels_yaml",
+            partial(write_ho_techlabel_excel_to_yaml,
+                    input_df=str(ho_labels_xlsx), filename="ho_tech_labels.yml"),
+            inputs=[ho_labels_xlsx],
+            outputs=[ho_labels_yaml],
+        ),
+        Stage(
+            "mbo_tech_labels_yaml",
+            partial(write_mbo_techlabel_excel_to_yaml,
+                    input_df=str(mbo_labels_xlsx), filename="mbo_tech_labels.yml"),
+            inputs=[mbo_labels_xlsx],
+            outputs=[mbo_labels_yaml],
+        ),
+        # ho file preparation
+        Stage(
+            "sdb",
+            partial(prepare_sdb_opleidingen_file,
+                    path=config.PATH_TO_RAW_DATA, file=config.SDB_FILE, data_quality_report=None),
+            inputs=[raw / config.SDB_FILE],
+            params=config.drop_studiekeuze_cols,
+        ),
+        Stage(
+            "hbo",
+            partial(unstack_duo_ho_files, ho_type="hbo"),
+            inputs=[raw / config.DUO_HBO_I_CSV, raw / config.DUO_HBO_D_CSV],
+            params={"schemas": [schemas.DUO_SCHEMAS["hbo_i"], schemas.DUO_SCHEMAS["hbo_d"]]},
+        ),
+        Stage(
+            "wo",
+            partial(unstack_duo_ho_files, ho_type="wo"),
+            inputs=[raw / config.DUO_WO_I_CSV, raw / config.DUO_WO_D_CSV],
+            params={"schemas": [schemas.DUO_SCHEMAS["wo_i"], schemas.DUO_SCHEMAS["wo_d"]]},
+        ),
+        Stage("duo", concat_hbo_wo, deps={"hbo_input_df": "hbo", "wo_input_df": "wo"}),
+        Stage(
+            "merged",
+            merge_duo_sdb_files,
+            deps={"duo_file": "duo", "sdb_file": "sdb"},
+            params={"file_year": config.FILE_YEAR},
+        ),
+        Stage(
+            "tagged",
+            partial(tag_tech_studies, tech_keywords=config.tech_keywords),
+            deps={"input_df": "merged"},
+            params=config.tech_keywords,
+        ),
+        Stage(
+            "labelled",
+            partial(label_tech_studies, yaml_file="ho_tech_labels.yml", label_col="opleidingsnaam_duo"),
+            deps={"input_df": "tagged"},
+            after=["ho_tech_labels_yaml"],
+            inputs=[ho_labels_yaml],
+        ),
+        Stage(
+            "ho_total_file",
+            partial(write_df, name=config.MUNGED_TOTAL),
+            deps={"input_df": "labelled"},
+            outputs=_munged_outputs(config.MUNGED_TOTAL),
+        ),
+        Stage("ho_tech_filtered", filter_tech_studies, deps={"input_df": "labelled"}),
+        Stage(
+            "ho_tech_file",
+            partial(write_df, name=config.MUNGED_HO_TECH),
+            deps={"input_df": "ho_tech_filtered"},
+            outputs=_munged_outputs(config.MUNGED_HO_TECH),
+        ),
+        Stage("ho_facts", build_facts, deps={"input_df": "ho_tech_filtered"}),
+        Stage(
+            "ho_facts_file",
+            write_facts,
+            deps={"facts_and_dims": "ho_facts"},
+            outputs=_munged_outputs(config.MUNGED_HO_FACTS)
+            + _munged_outputs(config.MUNGED_HO_DIMENSIONS),
+        ),
+        Stage(
+            "ho_cube",
+            partial(build_cube, dimensions=config.CUBE_HO_DIMENSIONS),
+            deps={"facts_and_dims": "ho_facts"},
+            params=config.CUBE_HO_DIMENSIONS,
+        ),
+        Stage(
+            "ho_cube_file",
+            partial(write_df, name=config.MUNGED_HO_CUBE),
+            deps={"input_df": "ho_cube"},
+            outputs=_munged_outputs(config.MUNGED_HO_CUBE),
+        ),
+        Stage(
+            "ho_label_candidates",
+            partial(write_label_candidates, label_col="opleidingsnaam_duo",
+                    yaml_file="ho_tech_labels.yml", filename="tech_label_candidates_ho.csv"),
+            deps={"input_df": "duo"},
+            after=["ho_tech_labels_yaml"],
+            inputs=[ho_labels_yaml],
+            outputs=[config.PATH_TO_MUNGED_DATA / "tech_label_candidates_ho.csv"],
+        ),
+        # mbo file preparation
+        Stage(
+            "mbo_names",
+            partial(read_duo_csv, path=config.PATH_TO_RAW_DATA, file=config.DUO_MBO_I_CSV,
+                    duo_type="mbo_i", usecols=["KWALIFICATIE NAAM"]),
+            inputs=[raw / config.DUO_MBO_I_CSV],
+            params={"schemas": schemas.DUO_SCHEMAS["mbo_i"]},
+        ),
+        Stage(
+            "mbo_label_candidates",
+            partial(write_label_candidates, label_col="KWALIFICATIE NAAM",
+                    yaml_file="mbo_tech_labels.yml", filename="tech_label_candidates_mbo.csv"),
+            deps={"input_df": "mbo_names"},
+            after=["mbo_tech_labels_yaml"],
+            inputs=[mbo_labels_yaml],
+            outputs=[config.PATH_TO_MUNGED_DATA / "tech_label_candidates_mbo.csv"],
+        ),
+        Stage(
+            "mbo",
+            munge_mbo_files,
+            inputs=[raw / config.DUO_MBO_I_CSV, raw / config.DUO_MBO_D_CSV, mbo_labels_yaml],
+            after=["mbo_tech_labels_yaml"],
+            params={
+                "chunksize": config.MBO_CHUNKSIZE,
+                "schemas": [schemas.DUO_SCHEMAS["mbo_i"], schemas.DUO_SCHEMAS["mbo_d"]],
+            },
+        ),
+        Stage(
+            "mbo_total_file",
+            partial(write_df, name=config.MUNGED_MBO_TOTAL),
+            deps={"input_df": "mbo"},
+            outputs=_munged_outputs(config.MUNGED_MBO_TOTAL),
+        ),
+        Stage("mbo_tech_filtered", filter_tech_studies, deps={"input_df": "mbo"}),
+        Stage(
+            "mbo_tech_file",
+            partial(write_df, name=config.MUNGED_MBO_TECH),
+            deps={"input_df": "mbo_tech_filtered"},
+            outputs=_munged_outputs(config.MUNGED_MBO_TECH),
+        ),
+        Stage("mbo_facts", build_facts, deps={"input_df": "mbo_tech_filtered"}),
+        Stage(
+            "mbo_cube",
+            partial(build_cube, dimensions=config.CUBE_MBO_DIMENSIONS),
+            deps={"facts_and_dims": "mbo_facts"},
+            params=config.CUBE_MBO_DIMENSIONS,
+        ),
+        Stage(
+            "mbo_cube_file",
+            partial(write_df, name=config.MUNGED_MBO_CUBE),
+            deps={"input_df": "mbo_cube"},
+            outputs=_munged_outputs(config.MUNGED_MBO_CUBE),
+        ),
+        # longitudinal store, appends the partitions of a new release
+        Stage(
+            "store",
+            partial(ingest_release, release=config.FILE_YEAR),
+            deps={"ho": "labelled", "mbo": "mbo"},
+            outputs=[partition_path(config.FILE_YEAR, level) for level in config.STORE_LEVELS],
+        ),
+    ]
+    return Pipeline(stages, cache_dir=cache_dir)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Clean, join and prepare the DUO and SDB files")
+    parser.add_argument(
+        "--force", action="store_true", help="rerun every stage, ignoring the cache"
+    )
+    parser.add_argument(
+        "--jobs", type=int, default=1,
+        help="number of processes, independent stages (hbo, wo, sdb, mbo) run concurrently",
+    )
+    parser.add_argument(
+        "--report-format", choices=["json", "parquet"], default="json",
+        help="format of the run report in config.PATH_TO_RUN_REPORTS",
+    )
+    parser.add_argument(
+        "stages", nargs="*", help="stages to produce, defaults to all written files"
+    )
+    args = parser.parse_args(argv)
+
+    targets = args.stages or [
+        "ho_total_file",
+        "ho_tech_file",
+        "ho_facts_file",
+        "ho_cube_file",
+        "ho_label_candidates",
+        "mbo_total_file",
+        "mbo_tech_file",
+        "mbo_cube_file",
+        "mbo_label_candidates",
+        "store",
+    ]
+    pipeline = build_pipeline()
+    pipeline.run(targets=targets, force=args.force, jobs=args.jobs)
+
+    run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+    pipeline.metrics.write(
+        os.path.join(str(config.PATH_TO_RUN_REPORTS), f"munge_{run_id}.{args.report_format}")
+    )
 
 
 if __name__ == "__main__":
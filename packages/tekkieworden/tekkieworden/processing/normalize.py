@@ -0,0 +1,118 @@
+import logging
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from tekkieworden.config import schemas
+
+
+_logger = logging.getLogger(__name__)
+
+
+def map_unique(series: pd.Series, func) -> pd.Series:
+    """
+    Applies a vectorized string function to the unique values of a column only
+    and maps the result back through the factorized codes. DUO columns repeat
+    a few hundred names over thousands of rows, so this is where the time goes.
+    :param series: pd.Series, object or categorical
+    :param func: function taking and returning a pd.Series of the same length
+    :return: categorical pd.Series
+    """
+    codes, uniques = pd.factorize(series)
+    values = func(pd.Series(np.asarray(uniques, dtype=object)))
+    new_codes, new_uniques = pd.factorize(values)
+    mapped = np.full(len(codes), -1, dtype=new_codes.dtype)
+    mapped[codes >= 0] = new_codes[codes[codes >= 0]]
+    return pd.Series(
+        pd.Categorical.from_codes(mapped, categories=new_uniques),
+        index=series.index,
+        name=series.name,
+    )
+
+
+def normalize_codes(series: pd.Series) -> pd.Series:
+    """
+    Formats BRIN, opleidings- and kwalificatiecodes as strings without a
+    decimal part: 34267.0 -> '34267'. Missing codes stay missing.
+    :param series: numeric or string pd.Series
+    :return: object pd.Series of strings
+    """
+    codes, uniques = pd.factorize(series)
+    if pd.api.types.is_numeric_dtype(series):
+        formatted = pd.Series(uniques).astype("int64").astype(str)
+    else:
+        formatted = pd.Series(uniques).astype(str).str.strip()
+    values = np.asarray(formatted, dtype=object).take(codes)
+    values[codes < 0] = np.nan
+    return pd.Series(values, index=series.index, name=series.name, dtype=object)
+
+
+def lower(series: pd.Series) -> pd.Series:
+    """
+    :return: lowercased categorical pd.Series
+    """
+    return map_unique(series, lambda s: s.str.lower())
+
+
+def strip_first_word(series: pd.Series) -> pd.Series:
+    """
+    Extracts the string after the first whitespace: 'B Elektrotechniek' ->
+    'Elektrotechniek'. Names without whitespace become missing.
+    :return: categorical pd.Series
+    """
+    return map_unique(series, lambda s: s.str.extract(r"\s(.*)", expand=False))
+
+
+def to_categories(input_df: pd.DataFrame, cols: List[str]) -> pd.DataFrame:
+    """
+    Factorizes repeated names (instellingen, opleidingen) into categoricals.
+    :param input_df: pd.DataFrame
+    :param cols: columns to convert
+    :return: pd.DataFrame with categorical cols
+    """
+    for col in cols:
+        if not isinstance(input_df[col].dtype, pd.CategoricalDtype):
+            input_df[col] = input_df[col].astype("category")
+    return input_df
+
+
+def mbo_column_mapping(header: Tuple[str, ...]) -> dict:
+    """
+    Maps the columns of a DUO MBO file to munged names: key columns are
+    lowercased with underscores (BRIN NUMMER -> brin_nummer), year figures
+    follow the year_regex of schemas.MBO (DIPVRW2016 -> 2016_vrouw_d), so the
+    mapping covers any year range. Built once per header.
+    :param header: tuple of column names as read by readers.read_duo_csv
+    :return: dict of DUO column -> munged column
+    """
+    return dict(_mbo_column_mapping(tuple(header)))
+
+
+@lru_cache(maxsize=16)
+def _mbo_column_mapping(header: tuple) -> tuple:
+    pattern = re.compile(schemas.MBO["year_regex"])
+    genders = schemas.MBO["genders"]
+    mapping, years = [], {}
+    for col in header:
+        match = pattern.match(col)
+        if match is None:
+            mapping.append((col, col.lower().replace(" ", "_")))
+            continue
+        suffix = "d" if match.group("diploma") else "i"
+        gender = genders[match.group("gender")]
+        mapping.append((col, f"{match.group('year')}_{gender}_{suffix}"))
+        years.setdefault((match.group("year"), suffix), set()).add(gender)
+
+    munged = [m for _, m in mapping]
+    if len(set(munged)) != len(munged):
+        raise ValueError(f"MBO header maps several columns to one name: {mapping}")
+    for (year, suffix), found in sorted(years.items()):
+        missing = {"man", "vrouw", "tot"} - found
+        if missing:
+            _logger.warning(
+                f"MBO header has no {sorted(missing)} column for {year}_{suffix}"
+            )
+    return tuple(mapping)
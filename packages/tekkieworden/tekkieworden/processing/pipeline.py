@@ -0,0 +1,311 @@
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import sys
+import types
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from tekkieworden.config import config
+from tekkieworden.processing import metrics
+from tekkieworden.processing.utilities import file_sha256
+
+
+_logger = logging.getLogger(__name__)
+
+# bump when the layout of the cached payload or of the fingerprint changes
+CACHE_VERSION = 3
+
+
+class Stage:
+    """
+    A named step of the munge pipeline.
+    :param name: unique stage name, used as cache key
+    :param func: callable producing the stage output
+    :param deps: dict of func keyword -> name of the stage whose output is passed in
+    :param after: stages that have to run first without passing their output,
+        e.g. the stage that writes a yaml file this stage reads
+    :param inputs: files the stage reads, fingerprinted by content. May be
+        written by an upstream stage, e.g. a yaml file
+    :param params: config values the stage reads, fingerprinted by value
+    :param outputs: files the stage writes. A missing output forces a rerun
+    """
+
+    def __init__(self, name, func, deps=None, after=(), inputs=(), params=None, outputs=()):
+        self.name = name
+        self.func = func
+        self.deps = dict(deps or {})
+        self.after = tuple(after)
+        self.inputs = [str(i) for i in inputs]
+        self.params = params
+        self.outputs = [str(o) for o in outputs]
+
+    @property
+    def upstream(self):
+        return list(self.deps.values()) + list(self.after)
+
+    def code_fingerprint(self) -> str:
+        """
+        Source of the module defining the stage function and of every
+        tekkieworden module it uses, directly or through the modules it
+        imports, plus any bound arguments. Editing a helper, e.g. pivot.py,
+        reruns the stages depending on it.
+        """
+        func, bound = self.func, []
+        while isinstance(func, functools.partial):
+            bound.append([repr(func.args), repr(sorted(func.keywords.items()))])
+            func = func.func
+        sources = [
+            [name, file_sha256(inspect.getsourcefile(module))]
+            for name, module in _imported_modules(inspect.getmodule(func))
+        ]
+        return json.dumps([getattr(func, "__qualname__", repr(func)), sources, bound])
+
+
+def _imported_modules(module) -> list:
+    """
+    :return: sorted (name, module) pairs of the module and the modules of its
+        own package or of tekkieworden it imports, followed transitively.
+        Modules count as imported when a module level name refers to them or
+        to a function or class defined in them
+    """
+    packages = {"tekkieworden", module.__name__.split(".")[0]}
+    found, todo = {}, [module]
+    while todo:
+        current = todo.pop()
+        if current.__name__ in found:
+            continue
+        found[current.__name__] = current
+        for value in vars(current).values():
+            name = value.__name__ if isinstance(value, types.ModuleType) else getattr(value, "__module__", None)
+            if not isinstance(name, str) or name.split(".")[0] not in packages:
+                continue
+            imported = sys.modules.get(name)
+            if imported is not None and getattr(imported, "__file__", None):
+                todo.append(imported)
+    return sorted(found.items())
+
+
+class Pipeline:
+    """
+    DAG of Stages with content-hash caching. A stage's fingerprint covers its
+    code, input file hashes, params and the fingerprints of its upstream
+    stages, so a rerun only recomputes stages downstream of what changed.
+    Every stale stage runs, sequentially or with jobs > 1 in a process pool.
+    Outputs are loaded from the cache lazily: a cached stage never loads the
+    outputs of its own upstream stages. The metrics recorded while a stage
+    runs are cached with its output and collected in self.metrics.
+    """
+
+    def __init__(self, stages, cache_dir=None):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.cache_dir = str(config.PATH_TO_CACHE if cache_dir is None else cache_dir)
+        self._fingerprints = {}
+        self._results = {}
+        self._ran = set()
+        self.metrics = metrics.MetricsCollector()
+
+    def order(self, targets=None) -> list:
+        """
+        :param targets: stage names to resolve, defaults to all stages
+        :return: the targets and their upstream stages in topological order
+        """
+        targets = list(self.stages) if targets is None else targets
+        ordered, visiting = [], set()
+
+        def visit(name):
+            if name in ordered:
+                return
+            if name in visiting:
+                raise ValueError(f"cycle in pipeline at stage: {name}")
+            if name not in self.stages:
+                raise KeyError(f"unknown stage: {name}")
+            visiting.add(name)
+            for upstream in self.stages[name].upstream:
+                visit(upstream)
+            visiting.discard(name)
+            ordered.append(name)
+
+        for target in targets:
+            visit(target)
+        return ordered
+
+    def fingerprint(self, name) -> str:
+        if name not in self._fingerprints:
+            stage = self.stages[name]
+            digest = hashlib.sha256()
+            digest.update(f"{CACHE_VERSION}:{stage.name}".encode())
+            digest.update(stage.code_fingerprint().encode())
+            for path in stage.inputs:
+                digest.update(path.encode())
+                # not written yet by an upstream stage
+                digest.update((file_sha256(path) if os.path.exists(path) else "missing").encode())
+            digest.update(json.dumps(stage.params, sort_keys=True, default=str).encode())
+            for upstream in stage.upstream:
+                digest.update(self.fingerprint(upstream).encode())
+            self._fingerprints[name] = digest.hexdigest()
+        return self._fingerprints[name]
+
+    def cache_path(self, name) -> str:
+        return os.path.join(self.cache_dir, f"{name}-{self.fingerprint(name)[:16]}.pkl")
+
+    def is_cached(self, name) -> bool:
+        stage = self.stages[name]
+        return os.path.exists(self.cache_path(name)) and all(
+            os.path.exists(o) for o in stage.outputs
+        )
+
+    def run(self, targets=None, force=False, jobs=1) -> dict:
+        """
+        :param targets: stage names to produce, defaults to all stages
+        :param force: recompute every stage, ignoring the cache
+        :param jobs: number of processes. With more than one, stages whose
+            upstream stages are done run concurrently, e.g. the hbo, wo, sdb
+            and mbo branches
+        :return: dict of target -> stage output
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        targets = list(self.stages) if targets is None else targets
+        self._fingerprints = {}
+        self._results = {}
+        self._ran = set()
+        self.metrics = metrics.MetricsCollector()
+        stale = {
+            name for name in self.order(targets) if force or not self.is_cached(name)
+        }
+        names = [n for n in self.order(targets) if n in stale]
+        _logger.info(f"stages to run: {names}")
+        if jobs > 1 and stale:
+            self._run_parallel(names, jobs)
+            stale = set()
+        # every stale stage runs, also those a cached target only reaches
+        # through `after`, e.g. a deleted yaml
+        for name in names if stale else []:
+            self._result(name, stale)
+        return {target: self._result(target, stale) for target in targets}
+
+    def _run_parallel(self, names, jobs):
+        """
+        Runs the stale stages in a process pool. Workers read their upstream
+        outputs from the cache and write their own output there, so stage
+        outputs never travel through the pool's pipes; only the metrics
+        records are sent back.
+        """
+        pending, running = list(names), {}
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            while pending or running:
+                for name in [n for n in pending if self._upstream_done(n, pending, running)]:
+                    pending.remove(name)
+                    stage = self.stages[name]
+                    dep_paths = {kw: self.cache_path(up) for kw, up in stage.deps.items()}
+                    _logger.info(f"stage {name}: submitted")
+                    future = pool.submit(
+                        _run_stage, stage, dep_paths, self.cache_path(name), self.cache_dir
+                    )
+                    running[future] = name
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    records = future.result()
+                    _logger.info(f"stage {name}: done")
+                    self.metrics.extend([dict(r, cached=False) for r in records])
+                    self._ran.add(name)
+                    self._refresh_fingerprints(name)
+
+    def _refresh_fingerprints(self, name):
+        """
+        Forgets the fingerprints of the stages reading the files stage `name`
+        just wrote, and of their downstream stages, so they are cached under
+        the hash of the new file content.
+        """
+        written = set(self.stages[name].outputs)
+        readers = {n for n, stage in self.stages.items() if written & set(stage.inputs)}
+        while True:
+            downstream = {
+                n for n, stage in self.stages.items()
+                if n not in readers and any(up in readers for up in stage.upstream)
+            }
+            if not downstream:
+                break
+            readers |= downstream
+        for reader in readers:
+            self._fingerprints.pop(reader, None)
+
+    def _upstream_done(self, name, pending, running) -> bool:
+        busy = set(pending) | set(running.values())
+        return not any(up in busy for up in self.stages[name].upstream)
+
+    def _result(self, name, stale):
+        if name in self._results:
+            return self._results[name]
+        stage = self.stages[name]
+
+        if name not in stale:
+            _logger.info(f"stage {name}: loading from cache")
+            result, records = self._load(name)
+            # records of stages run by _run_parallel are collected already
+            records = [] if name in self._ran else [dict(r, cached=True) for r in records]
+        else:
+            kwargs = {kw: self._result(up, stale) for kw, up in stage.deps.items()}
+            for up in stage.after:
+                self._result(up, stale)
+            _logger.info(f"stage {name}: running")
+            with metrics.collecting(stage=name) as collector:
+                with metrics.timed("stage", name) as timing:
+                    result = stage.func(**kwargs)
+            _logger.info(f"stage {name}: done in {timing['seconds']:.2f}s")
+            records = collector.as_records()
+            self._refresh_fingerprints(name)
+            self._store(name, (result, records))
+            records = [dict(r, cached=False) for r in records]
+
+        self.metrics.extend(records)
+        self._results[name] = result
+        return result
+
+    def _load(self, name):
+        return _load_payload(self.cache_path(name))
+
+    def _store(self, name, payload):
+        _store_payload(self.cache_dir, name, self.cache_path(name), payload)
+
+
+def _load_payload(path):
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _store_payload(cache_dir, name, destination, payload):
+    for old in os.listdir(cache_dir):
+        if old.startswith(f"{name}-") and old.endswith(".pkl"):
+            os.remove(os.path.join(cache_dir, old))
+    tmp_path = destination + ".part"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, destination)
+
+
+def _run_stage(stage, dep_paths, destination, cache_dir) -> list:
+    """
+    Runs a stage in a worker process of Pipeline._run_parallel.
+    :param stage: Stage to run
+    :param dep_paths: dict of func keyword -> cache file of the upstream stage
+    :param destination: cache file for the stage output
+    :param cache_dir: cache directory
+    :return: the metrics records of the stage
+    """
+    kwargs = {kw: _load_payload(path)[0] for kw, path in dep_paths.items()}
+    with metrics.collecting(stage=stage.name) as collector:
+        with metrics.timed("stage", stage.name, pid=os.getpid()) as timing:
+            result = stage.func(**kwargs)
+    _logger.info(f"stage {stage.name}: done in {timing['seconds']:.2f}s")
+    records = collector.as_records()
+    _store_payload(cache_dir, stage.name, destination, (result, records))
+    return records
@@ -0,0 +1,135 @@
+import logging
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+_logger = logging.getLogger(__name__)
+
+
+def group_ids(input_df: pd.DataFrame, keys: List[str]):
+    """
+    Integer-codes the key columns and combines them into one group id per row,
+    numbered in sorted key order like groupby(keys, sort=True). Rows with a
+    missing key get id -1, as groupby drops them.
+    :param input_df: pd.DataFrame
+    :param keys: key columns
+    :return: tuple of (group id per row, number of groups, position of the first
+        row of every group)
+    """
+    ids = np.zeros(len(input_df), dtype=np.int64)
+    missing = np.zeros(len(input_df), dtype=bool)
+    for key in keys:
+        codes, uniques = pd.factorize(input_df[key], sort=True)
+        missing |= codes < 0
+        # renumber after every key so the combined id never overflows
+        _, ids = np.unique(ids * (len(uniques) + 1) + codes + 1, return_inverse=True)
+        ids = ids.ravel()
+
+    _, valid_ids = np.unique(ids[~missing], return_inverse=True)
+    ids[~missing] = valid_ids.ravel()
+    ids[missing] = -1
+    n_groups = int(ids.max()) + 1 if len(ids) else 0
+    first = np.full(n_groups, len(ids), dtype=np.int64)
+    np.minimum.at(first, ids[~missing], np.flatnonzero(~missing))
+    return ids, n_groups, first
+
+
+def _key_frame(input_df, keys, first) -> pd.MultiIndex:
+    return pd.MultiIndex.from_frame(input_df[keys].iloc[first].reset_index(drop=True))
+
+
+def _values(input_df, cols) -> np.ndarray:
+    """
+    :return: float matrix of the figure columns, missing figures count as 0
+    """
+    values = np.column_stack(
+        [pd.to_numeric(input_df[c]).to_numpy(dtype="float64", na_value=np.nan) for c in cols]
+    ) if cols else np.empty((len(input_df), 0))
+    return np.nan_to_num(values, nan=0.0)
+
+
+def group_sum(input_df: pd.DataFrame, keys: List[str], value_cols: List[str]) -> pd.DataFrame:
+    """
+    groupby(keys).sum() on integer-coded keys, one bincount per value column.
+    :param input_df: pd.DataFrame
+    :param keys: key columns
+    :param value_cols: figure columns to sum
+    :return: pd.DataFrame indexed by keys, in sorted key order
+    """
+    ids, n_groups, first = group_ids(input_df, keys)
+    valid = ids >= 0
+    values = _values(input_df, value_cols)[valid]
+    sums = np.column_stack(
+        [np.bincount(ids[valid], weights=values[:, j], minlength=n_groups) for j in range(len(value_cols))]
+    ) if value_cols else np.empty((n_groups, 0))
+    return pd.DataFrame(sums, index=_key_frame(input_df, keys, first), columns=value_cols)
+
+
+def combine_sums(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds two group_sum results, e.g. the partial sums of two chunks of a file.
+    :return: pd.DataFrame with the union of the groups of left and right.
+        Categorical key levels stay categorical, with the union of the
+        categories of left and right
+    """
+    levels = list(range(left.index.nlevels))
+    combined = pd.concat([left, right]).groupby(level=levels, sort=False).sum()
+
+    # concat turns categorical levels with different categories into objects
+    keys = combined.index.to_frame(index=False)
+    for i, name in enumerate(keys.columns):
+        left_keys, right_keys = left.index.get_level_values(i), right.index.get_level_values(i)
+        if isinstance(left_keys.dtype, pd.CategoricalDtype) and isinstance(right_keys.dtype, pd.CategoricalDtype):
+            categories = left_keys.categories.union(right_keys.categories)
+            keys[name] = pd.Categorical(keys[name], categories=categories)
+    combined.index = pd.MultiIndex.from_frame(keys) if combined.index.nlevels > 1 else pd.Index(keys.iloc[:, 0])
+    return combined
+
+
+def pivot_gender(
+    input_df: pd.DataFrame,
+    keys: List[str],
+    year_cols: List[str],
+    suffix: str,
+    gender_col: str = "geslacht",
+) -> pd.DataFrame:
+    """
+    Aggregates a long DUO file (one row per gender) to the wide
+    {year}_{gender}{suffix} layout in one pass: the figures are summed into a
+    group x year x gender block with bincount and the totals are one reduction
+    over its gender axis.
+    :param input_df: pd.DataFrame with a gender column and one column per year
+    :param keys: key columns of the output rows, without the gender column
+    :param year_cols: year figure columns, e.g. ["2015", .., "2019"]
+    :param suffix: appended to the output columns, "_i" or "_d"
+    :param gender_col: column holding the gender, e.g. man / vrouw
+    :return: pd.DataFrame indexed by keys with the columns {year}_{gender}{suffix}
+        year by year, followed by {year}_tot{suffix}. A gender without rows in a
+        group is NaN, its total counts only the genders present.
+    """
+    # like a groupby on keys + gender, rows without a gender form no group
+    input_df = input_df[input_df[gender_col].notnull()]
+    ids, n_groups, first = group_ids(input_df, keys)
+    gender_codes, genders = pd.factorize(input_df[gender_col], sort=True)
+    valid = ids >= 0
+    n_genders = len(genders)
+
+    cells = ids[valid] * n_genders + gender_codes[valid]
+    size = n_groups * n_genders
+    values = _values(input_df, year_cols)[valid]
+    block = np.empty((n_groups, len(year_cols), n_genders))
+    for j in range(len(year_cols)):
+        block[:, j, :] = np.bincount(cells, weights=values[:, j], minlength=size).reshape(
+            n_groups, n_genders
+        )
+    present = np.bincount(cells, minlength=size).reshape(n_groups, 1, n_genders) > 0
+    block = np.where(present, block, np.nan)
+    totals = np.nansum(block, axis=2)
+
+    columns = [f"{y}_{g}{suffix}" for y in year_cols for g in genders]
+    columns += [f"{y}_tot{suffix}" for y in year_cols]
+    wide = np.hstack([block.reshape(n_groups, -1), totals])
+    _logger.debug(f"pivoted {len(input_df)} rows to {wide.shape}")
+    return pd.DataFrame(wide, index=_key_frame(input_df, keys, first), columns=columns)
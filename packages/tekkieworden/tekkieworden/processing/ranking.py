@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+
+
+# pseudo year ranking on the sum over all years
+ALL_YEARS = "all"
+
+
+class RankingIndex:
+    """
+    Top-k queries over the totals of one dimension per year, e.g. a rollup
+    of cube.index_cube. The totals are stored once as an array with a column
+    per year plus the sum over all years, a query selects the k largest with
+    a partial sort instead of sorting every value.
+    :param table: pd.DataFrame indexed by the dimension values with one
+        column per year
+    """
+
+    def __init__(self, table: pd.DataFrame):
+        self.values = table.index.to_numpy()
+        self.name = table.index.name
+        self.years = table.columns.tolist()
+        totals = table.to_numpy(dtype=float)
+        all_years = np.where(np.isnan(totals).all(axis=1), np.nan, np.nansum(totals, axis=1))
+        self.totals = np.column_stack([totals, all_years])
+        self._columns = {year: i for i, year in enumerate(self.years + [ALL_YEARS])}
+        self._positions = {value: i for i, value in enumerate(self.values)}
+
+    def __len__(self):
+        return len(self.values)
+
+    def _column(self, year):
+        if year is None:
+            return len(self.years) - 1
+        if year != ALL_YEARS:
+            year = type(self.years[0])(year) if self.years else year
+        return self._columns[year]
+
+    def mask(self, values) -> np.ndarray:
+        """
+        :param values: dimension values, unknown values are ignored
+        :return: boolean array selecting the values
+        """
+        where = np.zeros(len(self.values), dtype=bool)
+        where[[self._positions[v] for v in values if v in self._positions]] = True
+        return where
+
+    def selection(self, values=None) -> "Selection":
+        """
+        :param values: initially selected values, defaults to all
+        :return: a Selection over this index, updated per changed filter value
+        """
+        return Selection(self, values)
+
+    def top(self, k, year=None, where=None) -> pd.Series:
+        """
+        :param k: number of values returned
+        :param year: year to rank on, defaults to the latest, ALL_YEARS ranks
+            on the sum over all years
+        :param where: optional boolean mask of the values to rank, see mask
+        :return: pd.Series of the k largest totals, descending. Ties keep the
+            order of the table, like a stable sort
+        """
+        if k < 1:
+            raise ValueError(f"k must be at least 1, got {k}")
+        scores = self.totals[:, self._column(year)]
+        valid = ~np.isnan(scores)
+        if where is not None:
+            valid &= where
+        candidates = np.flatnonzero(valid)
+        if k < len(candidates):
+            # partial sort: the k-th largest is the threshold, ties at the
+            # threshold are all kept so the stable order can be restored
+            kth = np.argpartition(-scores[candidates], k - 1)[k - 1]
+            candidates = candidates[scores[candidates] >= scores[candidates[kth]]]
+        order = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        label = ALL_YEARS if year == ALL_YEARS else self.years[self._column(year)]
+        return pd.Series(scores[order], index=pd.Index(self.values[order], name=self.name), name=label)
+
+
+class Selection:
+    """
+    Filter state over a RankingIndex. include / exclude only touch the
+    positions of the changed values, so a widget change does not rebuild the
+    mask of the whole catalogue.
+    """
+
+    def __init__(self, index: RankingIndex, values=None):
+        self.index = index
+        self.mask = np.ones(len(index), dtype=bool) if values is None else index.mask(values)
+
+    def include(self, values):
+        self.mask[self._positions(values)] = True
+        return self
+
+    def exclude(self, values):
+        self.mask[self._positions(values)] = False
+        return self
+
+    def _positions(self, values):
+        return [self.index._positions[v] for v in values if v in self.index._positions]
+
+    def top(self, k, year=None) -> pd.Series:
+        return self.index.top(k, year=year, where=self.mask)
@@ -1,34 +1,250 @@
-import csv
-import requests
+import argparse
+import codecs
+import hashlib
+import json
 import logging
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List
+
+import pandas as pd
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import requests
+from requests.adapters import HTTPAdapter
 import yaml
 
-from tekkieworden.config import config
+from tekkieworden.config import config, schemas
+from tekkieworden.processing.utilities import file_sha256
+from tekkieworden.processing.writers import munged_path
 
 
 _logger = logging.getLogger(__name__)
 
 
-def download_duo_files(url, file: str):
+def duo_file_path(file: str, path=None) -> str:
+    """
+    :param file: DUO file stem, e.g. config.DUO_HBO_I_FILE
+    :param path: directory to store the file in, defaults to RAW data folder
+    :return: full path of the csv for the configured FILE_YEAR
+    """
+    path = config.PATH_TO_RAW_DATA if path is None else path
+    return os.path.join(str(path), f"{file}_{config.FILE_YEAR}.csv")
+
+
+def download_duo_files(
+    url, file: str, path=None, chunk_size=None, session=None, cached=None
+) -> dict:
     """
+    Streams a DUO csv to disk in fixed-size chunks. The response is never held
+    in memory as a whole: bytes are decoded from ISO-8859-1 once, re-encoded to
+    UTF-8 and written to a temp file that is renamed into place when complete.
+    When a cached manifest entry is passed and the local file is still intact,
+    the request is conditional and a 304 leaves the file untouched.
     :param url:  https://duo.nl/open_onderwijsdata/databestanden/ho/ingeschreven/
     :param file: Hoger Onderwijs hbo_inscriptions + wo_inscriptions
-    :return: downloaded csv saved to RAW data folder
-    """
-    response = requests.get(url)
-    print(f"Downloading: {file}, writing to {config.PATH_TO_RAW_DATA}")
-    with open(
-        str(config.PATH_TO_RAW_DATA)
-        + "/"
-        + file
-        + "_"
-        + str(config.FILE_YEAR)
-        + ".csv",
-        "w",
-    ) as f:
-        writer = csv.writer(f)
-        for line in response.iter_lines():
-            writer.writerow(line.decode("ISO-8859-1").split(","))
+    :param path: directory to write to, defaults to RAW data folder
+    :param chunk_size: number of bytes per chunk
+    :param session: optional requests.Session to reuse connections
+    :param cached: manifest entry of the previous download of this file
+    :return: manifest entry with path, etag, last_modified, size, sha256 and changed
+    """
+    chunk_size = config.DOWNLOAD_CHUNK_SIZE if chunk_size is None else chunk_size
+    destination = duo_file_path(file=file, path=path)
+    getter = session.get if session is not None else requests.get
+
+    headers = {}
+    if cached and _is_intact(destination, cached):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    decoder = codecs.getincrementaldecoder(config.DOWNLOAD_SOURCE_ENCODING)()
+    encoding = config.DOWNLOAD_TARGET_ENCODING
+    sha256 = hashlib.sha256()
+    size = 0
+
+    with getter(url, stream=True, headers=headers) as response:
+        if response.status_code == 304:
+            _logger.info(f"{file}: not modified since last download, skipping")
+            return dict(cached, path=destination, changed=False)
+        response.raise_for_status()
+
+        _logger.info(f"Downloading: {file}, writing to {destination}")
+        total = int(response.headers.get("Content-Length", 0)) or None
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(destination), prefix=f".{file}_", suffix=".part"
+        )
+        received = 0
+        next_report = config.DOWNLOAD_PROGRESS_INTERVAL
+        start = time.perf_counter()
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    if not chunk:
+                        continue
+                    data = decoder.decode(chunk).encode(encoding)
+                    f.write(data)
+                    sha256.update(data)
+                    size += len(data)
+                    received += len(chunk)
+                    if received >= next_report:
+                        _log_progress(file, received, total, start)
+                        next_report += config.DOWNLOAD_PROGRESS_INTERVAL
+                data = decoder.decode(b"", final=True).encode(encoding)
+                f.write(data)
+                sha256.update(data)
+                size += len(data)
+            os.replace(tmp_path, destination)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        _log_progress(file, received, total, start)
+        entry = {
+            "url": url,
+            "path": destination,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "size": size,
+            "sha256": sha256.hexdigest(),
+        }
+
+    # servers without validators still tell us nothing changed via the hash
+    entry["changed"] = not cached or cached.get("sha256") != entry["sha256"]
+    return entry
+
+
+def _is_intact(destination, cached) -> bool:
+    return (
+        os.path.exists(destination)
+        and os.path.getsize(destination) == cached.get("size")
+    )
+
+
+def _log_progress(file, received, total, start):
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    done = f" of {total} ({100 * received / total:.0f}%)" if total else ""
+    _logger.info(
+        f"{file}: {received} bytes{done}, {received / elapsed / 1024:.1f} kB/s"
+    )
+
+
+def download_with_retries(url, file: str, retries=None, backoff=None, **kwargs):
+    """
+    Calls download_duo_files and retries on connection errors and 5xx/429
+    responses, sleeping backoff, 2 * backoff, 4 * backoff, ... in between.
+    :param retries: number of retries after the first attempt
+    :param backoff: initial sleep in seconds
+    :return: manifest entry of the downloaded csv
+    """
+    retries = config.DOWNLOAD_RETRIES if retries is None else retries
+    backoff = config.DOWNLOAD_BACKOFF if backoff is None else backoff
+    for attempt in range(retries + 1):
+        try:
+            return download_duo_files(url=url, file=file, **kwargs)
+        except requests.RequestException as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            wait = backoff * 2 ** attempt
+            _logger.warning(f"{file}: attempt {attempt + 1} failed ({e}), retrying in {wait}s")
+            time.sleep(wait)
+
+
+def _is_retryable(error) -> bool:
+    response = getattr(error, "response", None)
+    if response is None:
+        return True
+    return response.status_code == 429 or response.status_code >= 500
+
+
+def download_all(downloads=None, max_workers=None, path=None, use_cache=True, **kwargs):
+    """
+    Fetches all DUO sources in parallel over one pooled keep-alive session and
+    records the result in the download manifest. Files that did not change on
+    the DUO side are revalidated with a conditional request and not downloaded.
+    :param downloads: list of (url, file) pairs, defaults to config.DUO_DOWNLOADS
+    :param max_workers: number of concurrent downloads
+    :param path: directory to write to, defaults to RAW data folder
+    :param use_cache: send conditional requests based on the manifest
+    :return: dict of file -> manifest entry of the downloaded csv
+    """
+    downloads = config.DUO_DOWNLOADS if downloads is None else downloads
+    max_workers = config.DOWNLOAD_MAX_WORKERS if max_workers is None else max_workers
+    manifest = load_download_manifest(path=path)
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(
+            pool_connections=max_workers, pool_maxsize=max_workers
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(
+                    download_with_retries,
+                    url=url,
+                    file=file,
+                    path=path,
+                    session=session,
+                    cached=manifest.get(_manifest_key(file)) if use_cache else None,
+                    **kwargs,
+                ): file
+                for url, file in downloads
+            }
+            results, errors = {}, []
+            for future in as_completed(futures):
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    _logger.error(f"downloading {futures[future]} failed: {e}")
+                    errors.append(e)
+
+    # keep the entries of the files that did download, also when others failed
+    for file, entry in results.items():
+        manifest[_manifest_key(file)] = entry
+    write_download_manifest(manifest, path=path)
+    if errors:
+        raise errors[0]
+    changed = [file for file, entry in results.items() if entry["changed"]]
+    _logger.info(f"{len(changed)} of {len(results)} DUO files changed: {changed}")
+
+    return results
+
+
+def _manifest_key(file: str) -> str:
+    return os.path.basename(duo_file_path(file=file))
+
+
+def download_manifest_path(path=None) -> str:
+    path = config.PATH_TO_RAW_DATA if path is None else path
+    return os.path.join(str(path), config.DOWNLOAD_MANIFEST_FILE)
+
+
+def load_download_manifest(path=None) -> dict:
+    """
+    :param path: directory holding the manifest, defaults to RAW data folder
+    :return: dict of csv filename -> manifest entry, empty if there is none yet
+    """
+    try:
+        with open(download_manifest_path(path=path), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def write_download_manifest(manifest: dict, path=None):
+    destination = download_manifest_path(path=path)
+    tmp_path = destination + ".part"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, destination)
 
 
 def open_tech_label_yaml(yaml_file):
@@ -41,22 +257,197 @@ def open_tech_label_yaml(yaml_file):
     return tech_label_dict
 
 
+def read_duo_csv(path, file: str, duo_type: str, usecols=None, chunksize=None):
+    """
+    Reads a raw DUO csv straight into the compact dtypes of its schema in
+    config.schemas: only the listed columns, codes as strings, labels as
+    categories and year figures as nullable ints.
+    :param path: path to DUO file
+    :param file: name of DUO file
+    :param duo_type: key of config.schemas.DUO_SCHEMAS, e.g. "hbo_i" or "mbo_d"
+    :param usecols: read these columns instead of the schema's usecols
+    :param chunksize: read the file in blocks of this many rows
+    :return: pd.DataFrame with the raw DUO column names, or an iterator of
+        pd.DataFrames when chunksize is given
+    """
+    schema = schemas.DUO_SCHEMAS[duo_type]
+    source = os.path.join(str(path), file)
+    header = pd.read_csv(source, sep=";", nrows=0).columns
+    year_cols = [c for c in header if re.match(schema["year_regex"], c)]
+    usecols = list(schema["usecols"] if usecols is None else usecols) + year_cols
+
+    dtype = {c: t for c, t in schema["dtype"].items() if c in usecols}
+    dtype.update({c: schemas.YEAR_DTYPE for c in year_cols})
+    return pd.read_csv(
+        source,
+        sep=";",
+        usecols=usecols,
+        dtype=dtype,
+        engine="c",
+        chunksize=chunksize,
+    )
+
+
+def detect_ho_duo_type(path, file: str, ho_type: str) -> str:
+    """
+    Picks the schema of a raw DUO HO file from its header instead of its name:
+    ingeschrevenen files have a TYPE HOGER ONDERWIJS column, gediplomeerden
+    files a SOORT DIPLOMA column.
+    :param path: path to DUO file
+    :param file: name of DUO file
+    :param ho_type: hbo or wo
+    :return: key of config.schemas.DUO_SCHEMAS, e.g. "hbo_d"
+    """
+    header = set(pd.read_csv(os.path.join(str(path), file), sep=";", nrows=0).columns)
+    matches = [
+        duo_type
+        for duo_type in (f"{ho_type}_i", f"{ho_type}_d")
+        if set(schemas.DUO_SCHEMAS[duo_type]["usecols"]) <= header
+    ]
+    if len(matches) != 1:
+        raise ValueError(
+            f"header of {file} matches {matches or 'no'} DUO schema of {ho_type}, columns: {sorted(header)}"
+        )
+    return matches[0]
+
+
+def read_munged_file(name, columns=None, fmt=None, path=None) -> pd.DataFrame:
+    """
+    Reads a munged dataset written by writers.write_df. Falls back to the csv
+    export when the columnar file is not there, keeping code columns as strings.
+    :param name: name of the dataset without extension, e.g. config.MUNGED_HO_TECH
+    :param columns: only read these columns
+    :param fmt: "parquet", "feather" or "csv", defaults to config.MUNGED_FORMAT
+    :param path: directory, defaults to MUNGED data folder
+    :return: pd.DataFrame
+    """
+    fmt = config.MUNGED_FORMAT if fmt is None else fmt
+    source = munged_path(name, fmt=fmt, path=path)
+    if fmt != "csv" and not os.path.exists(source):
+        _logger.info(f"{source} not found, reading csv export")
+        fmt, source = "csv", munged_path(name, fmt="csv", path=path)
+
+    if fmt == "parquet":
+        return pd.read_parquet(source, columns=columns)
+    if fmt == "feather":
+        return pd.read_feather(source, columns=columns)
+    return pd.read_csv(
+        source,
+        usecols=columns,
+        dtype={c: str for c in config.MUNGED_CODE_COLS if columns is None or c in columns},
+    )
+
+
+def munged_columns(name, fmt=None, path=None) -> List[str]:
+    """
+    Column names of a munged dataset, without reading its data.
+    :param name: name of the dataset without extension
+    :return: list of column names
+    """
+    fmt = config.MUNGED_FORMAT if fmt is None else fmt
+    source = munged_path(name, fmt=fmt, path=path)
+    if fmt == "parquet" and os.path.exists(source):
+        return pq.read_schema(source).names
+    if fmt == "feather" and os.path.exists(source):
+        return ipc.open_file(source).schema.names
+    return pd.read_csv(munged_path(name, fmt="csv", path=path), nrows=0).columns.tolist()
+
+
+def year_columns(columns, gender="tot", suffix="_i") -> List[str]:
+    """
+    Year figure columns of a munged dataset, so callers don't hard-code the
+    5-year window of a DUO release.
+    :param columns: column names, e.g. from munged_columns
+    :param gender: "man", "vrouw" or "tot"
+    :param suffix: "_i" (ingeschrevenen) or "_d" (gediplomeerden)
+    :return: matching columns sorted by year, e.g. ["2015_tot_i", .., "2019_tot_i"]
+    """
+    pattern = re.compile(rf"^(\d{{4}})_{gender}{suffix}$")
+    return sorted((c for c in columns if pattern.match(str(c))), key=lambda c: str(c)[:4])
+
+
+def read_excel_snapshot(path, file: str, sheet_name, columns=None) -> pd.DataFrame:
+    """
+    Reads an Excel sheet through a parquet snapshot in config.PATH_TO_CACHE.
+    The workbook is only parsed when its mtime/size changed and its sha256
+    no longer matches the snapshot; later reads only load the requested
+    columns. Mixed-type text columns are stored as strings.
+    :param path: directory holding the workbook
+    :param file: name of the workbook
+    :param sheet_name: sheet to read
+    :param columns: only read these columns, defaults to all
+    :return: pd.DataFrame
+    """
+    workbook = os.path.join(str(path), file)
+    meta = _excel_snapshot_meta(workbook, sheet_name)
+    if columns is not None:
+        missing = [c for c in columns if c not in meta["columns"]]
+        if missing:
+            raise KeyError(f"{missing} not in sheet {sheet_name} of {file}")
+    return pd.read_parquet(meta["snapshot"], columns=columns)
+
+
+def excel_snapshot_columns(path, file: str, sheet_name) -> List[str]:
+    """
+    :return: column names of an Excel sheet, from its snapshot
+    """
+    return _excel_snapshot_meta(os.path.join(str(path), file), sheet_name)["columns"]
+
+
+def _excel_snapshot_meta(workbook, sheet_name) -> dict:
+    os.makedirs(str(config.PATH_TO_CACHE), exist_ok=True)
+    stem = f"{os.path.splitext(os.path.basename(workbook))[0]}_{sheet_name}"
+    meta_path = os.path.join(str(config.PATH_TO_CACHE), f"{stem}.json")
+    stat = os.stat(workbook)
+
+    try:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        meta = {}
+    if not os.path.exists(meta.get("snapshot", "")):
+        meta = {}
+
+    if meta and (meta["mtime_ns"], meta["size"]) == (stat.st_mtime_ns, stat.st_size):
+        return meta
+
+    sha256 = file_sha256(workbook)
+    if not meta or meta["sha256"] != sha256:
+        _logger.info(f"Parsing {workbook} sheet {sheet_name}, creating snapshot")
+        df = pd.read_excel(workbook, sheet_name=sheet_name)
+        for col in df.columns[df.dtypes == object]:
+            if pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+                df[col] = df[col].astype(str).where(df[col].notnull())
+        meta = {
+            "sha256": sha256,
+            "columns": [str(c) for c in df.columns],
+            "snapshot": os.path.join(str(config.PATH_TO_CACHE), f"{stem}.parquet"),
+        }
+        df.columns = meta["columns"]
+        df.to_parquet(meta["snapshot"], index=False)
+
+    meta.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download the DUO source files")
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="download every file, ignoring the download manifest",
+    )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=config.DOWNLOAD_MAX_WORKERS,
+        help="number of files to download concurrently",
+    )
+    args = parser.parse_args(argv)
+    download_all(max_workers=args.max_workers, use_cache=not args.force)
+
+
 if __name__ == "__main__":
-    download_duo_files(
-        url=config.HBO_CSV_I_URL, file=config.DUO_HBO_I_FILE
-    )  # hbo ingeschrevenen
-    download_duo_files(
-        url=config.HBO_CSV_D_URL, file=config.DUO_HBO_D_FILE
-    )  # hbo gediplomeerden
-    download_duo_files(
-        url=config.WO_CSV_I_URL, file=config.DUO_WO_I_FILE
-    )  # wo ingeschrevenen
-    download_duo_files(
-        url=config.WO_CSV_D_URL, file=config.DUO_WO_D_FILE
-    )  # wo gediplomeerden
-    download_duo_files(
-        url=config.MBO_CSV_I_URL, file=config.DUO_MBO_I_FILE
-    )  # mbo ingeschrevenen (deelnemers)
-    download_duo_files(
-        url=config.MBO_CSV_D_URL, file=config.DUO_MBO_D_FILE
-    )  # mbo gediplomeerden
+    main()
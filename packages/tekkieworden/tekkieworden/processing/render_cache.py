@@ -0,0 +1,91 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable
+
+
+_logger = logging.getLogger(__name__)
+
+
+class RenderCache:
+    """
+    Thread-safe LRU cache of rendered chart payloads (PNG bytes, Vega-Lite
+    JSON) keyed on the widget state. Concurrent requests for a key that is
+    being rendered wait for that render instead of plotting it again.
+    :param maxsize: number of payloads kept, the least recently used is
+        evicted first
+    """
+
+    def __init__(self, maxsize=64):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be at least 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._payloads = OrderedDict()
+        self._rendering = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._payloads)
+
+    def __contains__(self, key):
+        return key in self._payloads
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            if key not in self._payloads:
+                return default
+            self._payloads.move_to_end(key)
+            return self._payloads[key]
+
+    def put(self, key: Hashable, payload):
+        with self._lock:
+            self._put(key, payload)
+
+    def _put(self, key, payload):
+        self._payloads[key] = payload
+        self._payloads.move_to_end(key)
+        while len(self._payloads) > self.maxsize:
+            evicted, _ = self._payloads.popitem(last=False)
+            _logger.debug(f"evicted {evicted}")
+
+    def get_or_render(self, key: Hashable, render: Callable[[], object]):
+        """
+        :param key: hashable widget state, e.g. (analysis, dimvar, filters, data version)
+        :param render: called without arguments on a miss, returns the payload
+        :return: the cached or freshly rendered payload
+        """
+        while True:
+            with self._lock:
+                if key in self._payloads:
+                    self.hits += 1
+                    self._payloads.move_to_end(key)
+                    return self._payloads[key]
+                pending = self._rendering.get(key)
+                if pending is None:
+                    self.misses += 1
+                    pending = self._rendering[key] = threading.Event()
+                    break
+            # another thread renders this key, reuse its payload when done.
+            # Loops and renders itself when that render failed
+            pending.wait()
+
+        try:
+            payload = render()
+            with self._lock:
+                self._put(key, payload)
+            return payload
+        finally:
+            with self._lock:
+                del self._rendering[key]
+            pending.set()
+
+    def clear(self):
+        with self._lock:
+            self._payloads.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._payloads), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,63 @@
+import numpy as np
+
+
+spark_chars = u"▁▂▃▄▅▆▇█"
+"""Eight unicode characters of (nearly) steadily increasing height."""
+
+# character table indexed by level, the last entry marks a missing value
+_CHARS = np.array(list(spark_chars) + [" "])
+
+
+def spark_lines(data, scale="row", minimum=None, maximum=None) -> np.ndarray:
+    """
+    Converts every row of a 2-D array to a sparkline string in one pass.
+    Missing values are drawn as a space, a row of equal values as a baseline.
+
+    Example:
+    >>> spark_lines([[1, 2, 3], [3, float("nan"), 1]]).tolist()
+    ['▁▅█', '█ ▁']
+
+    :param data: 2-D array like of numbers, e.g. df[year_cols], one series per row
+    :param scale: "row" scales every row on its own minimum and maximum,
+        "global" all rows on the minimum and maximum of the whole array, so
+        the heights compare across rows
+    :param minimum: optional fixed lower bound, values below it are clamped
+    :param maximum: optional fixed upper bound, values above it are clamped
+    :return: np.ndarray of one sparkline string per row
+    """
+    data = np.atleast_2d(np.asarray(data, dtype=float))
+    if scale not in ("row", "global"):
+        raise ValueError(f"scale must be 'row' or 'global', got {scale!r}")
+    missing = np.isnan(data)
+    axis = 1 if scale == "row" else None
+
+    # inf / -inf for rows without values, those rows are all missing anyway
+    if minimum is None:
+        minimum = np.where(missing, np.inf, data).min(axis=axis, keepdims=True, initial=np.inf)
+    if maximum is None:
+        maximum = np.where(missing, -np.inf, data).max(axis=axis, keepdims=True, initial=-np.inf)
+    data_range = maximum - minimum
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        levels = np.rint((np.clip(data, minimum, maximum) - minimum) * ((len(spark_chars) - 1.0) / data_range))
+    levels = np.where(data_range > 0, levels, 0)
+    levels = np.where(missing, len(spark_chars), levels).astype(int)
+
+    if data.shape[1] == 0:
+        return np.full(len(data), "")
+    # the characters of a row are contiguous, view them as one string per row
+    return np.ascontiguousarray(_CHARS[levels]).view(f"<U{data.shape[1]}").ravel()
+
+
+def create_spark_charts(series, minimum=None, maximum=None):
+    """
+    Converts pd.Series to a sparkline string, see spark_lines for many series.
+
+    Example:
+    >>> create_spark_charts([ 0.5, 1.2, 3.5, 7.3, 8.0, 12.5, float("nan"), 15.0, 14.2,\
+    11.8, 6.1, 1.9 ])
+    '▁▁▂▄▅▇ ██▆▄▂'
+
+    Raises ValueError if input data cannot be converted to float.
+    """
+    return str(spark_lines([series], minimum=minimum, maximum=maximum)[0])
@@ -0,0 +1,231 @@
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import List
+
+import pandas as pd
+
+from tekkieworden.config import config
+from tekkieworden.processing.readers import read_munged_file
+
+
+_logger = logging.getLogger(__name__)
+
+_FIGURE_COL = re.compile(config.MUNGED_FIGURE_REGEX)
+PARTITION_FILE = "part.parquet"
+TMP_SUFFIX = ".part"
+
+
+def to_long(input_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Melts the {year}_{gender}_{i|d} figure columns of a munged dataset to rows.
+    Columns holding lists (e.g. gemeentenummer_duo) are not kept.
+    :param input_df: munged pd.DataFrame
+    :return: pd.DataFrame with the dimension columns plus year, gender, measure
+        and count
+    """
+    figure_cols = [c for c in input_df.columns if _FIGURE_COL.match(str(c))]
+    dims = [
+        c for c in input_df.columns
+        if c not in figure_cols
+        and not (
+            input_df[c].dtype == object
+            and input_df[c].map(lambda v: isinstance(v, (list, tuple))).any()
+        )
+    ]
+    long_df = input_df[dims + figure_cols].melt(
+        id_vars=dims, value_vars=figure_cols, var_name="figure", value_name="count"
+    )
+    parts = long_df.pop("figure").str.extract(_FIGURE_COL.pattern)
+    long_df["year"] = parts[0].astype("int16")
+    long_df["gender"] = pd.Categorical(parts[1], categories=["man", "vrouw", "tot"])
+    long_df["measure"] = pd.Categorical(
+        parts[2].map(config.STORE_MEASURES), categories=list(config.STORE_MEASURES.values())
+    )
+    long_df["count"] = long_df["count"].astype("float64")
+    return long_df.dropna(subset=["count"]).reset_index(drop=True)
+
+
+def partition_path(release: int, level: str, dataset=None, path=None) -> str:
+    dataset = config.STORE_DATASET if dataset is None else dataset
+    path = config.PATH_TO_STORE if path is None else path
+    return os.path.join(str(path), dataset, f"release={release}", f"level={level}")
+
+
+def partitions(dataset=None, path=None) -> pd.DataFrame:
+    """
+    :return: pd.DataFrame with release, level and path of the stored partitions
+    """
+    root = os.path.dirname(os.path.dirname(partition_path(0, "", dataset=dataset, path=path)))
+    rows = []
+    if os.path.isdir(root):
+        for release_dir in sorted(os.listdir(root)):
+            if not release_dir.startswith("release="):
+                continue
+            for level_dir in sorted(os.listdir(os.path.join(root, release_dir))):
+                partition = os.path.join(root, release_dir, level_dir)
+                # level=..part dirs are left by an interrupted ingest
+                if (
+                    level_dir.startswith("level=")
+                    and not level_dir.endswith(TMP_SUFFIX)
+                    and os.path.exists(os.path.join(partition, PARTITION_FILE))
+                ):
+                    rows.append(
+                        {
+                            "release": int(release_dir.split("=", 1)[1]),
+                            "level": level_dir.split("=", 1)[1],
+                            "path": partition,
+                        }
+                    )
+    return pd.DataFrame(rows, columns=["release", "level", "path"])
+
+
+def ingest(input_df: pd.DataFrame, release: int, level: str, dataset=None, path=None) -> str:
+    """
+    Adds one DUO release of one level to the store. The store is append-only:
+    an existing partition is never overwritten.
+    :param input_df: munged pd.DataFrame of a single level, e.g. the hbo rows
+    :param release: year of the DUO release, e.g. config.FILE_YEAR
+    :param level: "hbo", "wo" or "mbo"
+    :param dataset: name of the dataset, defaults to config.STORE_DATASET
+    :param path: root of the store, defaults to config.PATH_TO_STORE
+    :return: path of the new partition
+    """
+    if level not in config.STORE_LEVELS:
+        raise ValueError(f"unknown level {level}, expected one of {config.STORE_LEVELS}")
+    partition = partition_path(release, level, dataset=dataset, path=path)
+    if os.path.exists(partition):
+        raise FileExistsError(f"release {release} of {level} is already stored: {partition}")
+
+    long_df = to_long(input_df)
+    # write next to the partition and rename, a failed ingest leaves no partition
+    tmp_partition = partition + TMP_SUFFIX
+    shutil.rmtree(tmp_partition, ignore_errors=True)
+    os.makedirs(tmp_partition)
+    long_df.to_parquet(os.path.join(tmp_partition, PARTITION_FILE), index=False)
+    with open(os.path.join(tmp_partition, "_meta.json"), "w") as f:
+        json.dump(
+            {
+                "release": release,
+                "level": level,
+                "rows": len(long_df),
+                "years": sorted(int(y) for y in long_df["year"].unique()),
+                "ingested": datetime.now().isoformat(timespec="seconds"),
+            },
+            f,
+            indent=2,
+        )
+    os.rename(tmp_partition, partition)
+    _logger.info(f"Stored {len(long_df)} rows of {level} release {release} in {partition}")
+    return partition
+
+
+def query(
+    levels: List[str] = None,
+    releases: List[int] = None,
+    years: List[int] = None,
+    columns: List[str] = None,
+    dataset=None,
+    path=None,
+) -> pd.DataFrame:
+    """
+    Reads the store, only opening the partitions of the requested releases
+    and levels.
+    :param levels: levels to read, defaults to all stored levels
+    :param releases: releases to read, defaults to all stored releases
+    :param years: only keep these years
+    :param columns: columns to read, year and count are always read
+    :return: long pd.DataFrame with release and level columns added
+    """
+    selected = partitions(dataset=dataset, path=path)
+    if levels is not None:
+        selected = selected[selected.level.isin(levels)]
+    if releases is not None:
+        selected = selected[selected.release.isin(releases)]
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ["year", "count"]))
+
+    frames = []
+    for partition in selected.itertuples(index=False):
+        df = pd.read_parquet(os.path.join(partition.path, PARTITION_FILE), columns=columns)
+        if years is not None:
+            df = df[df["year"].isin(years)]
+        frames.append(df.assign(release=partition.release, level=partition.level))
+    _logger.debug(f"read {len(frames)} partitions")
+    if not frames:
+        return pd.DataFrame(columns=(columns or ["year", "count"]) + ["release", "level"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def trend(levels: List[str] = None, years: List[int] = None, columns: List[str] = None,
+          dataset=None, path=None) -> pd.DataFrame:
+    """
+    Figures over all ingested releases, every year taken from the latest release
+    that contains it, so revised figures replace older ones.
+    :param levels: levels to read, defaults to all stored levels
+    :param years: only keep these years
+    :param columns: dimension columns to read, e.g. ["tech_label", "gender", "measure"]
+    :return: long pd.DataFrame
+    """
+    df = query(levels=levels, years=years, columns=columns, dataset=dataset, path=path)
+    if df.empty:
+        return df
+    # gediplomeerden lag behind ingeschrevenen, so pick the release per measure
+    keys = [c for c in ["level", "measure", "year"] if c in df.columns]
+    latest = df.groupby(keys, observed=True)["release"].transform("max")
+    return df[df["release"] == latest].reset_index(drop=True)
+
+
+def ingest_release(ho: pd.DataFrame, mbo: pd.DataFrame, release=None, path=None) -> List[str]:
+    """
+    Ingests the hbo, wo and mbo partitions of a release that are not stored
+    yet, so rerunning the munge pipeline on the same release adds nothing.
+    Tech and non-tech studies are both stored, tech_label tells them apart.
+    :param ho: munged HO total pd.DataFrame with a ho_type column
+    :param mbo: munged MBO total pd.DataFrame
+    :param release: defaults to config.FILE_YEAR
+    :return: paths of the new partitions
+    """
+    release = config.FILE_YEAR if release is None else release
+    levels = {"hbo": ho[ho.ho_type == "hbo"], "wo": ho[ho.ho_type == "wo"], "mbo": mbo}
+    stored = []
+    for level, level_df in levels.items():
+        if os.path.exists(partition_path(release, level, path=path)):
+            _logger.info(f"release {release} of {level} is already stored, skipped")
+            continue
+        stored.append(ingest(level_df, release=release, level=level, path=path))
+    return stored
+
+
+def ingest_munged(release=None, path=None) -> List[str]:
+    """
+    Ingests the munged HO and MBO total files of the current release.
+    :param release: defaults to config.FILE_YEAR
+    :return: paths of the new partitions
+    """
+    return ingest_release(
+        read_munged_file(config.MUNGED_TOTAL), read_munged_file(config.MUNGED_MBO_TOTAL),
+        release=release, path=path,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Longitudinal store of DUO releases")
+    parser.add_argument(
+        "--release",
+        type=int,
+        default=config.FILE_YEAR,
+        help="DUO release year of the munged files to ingest",
+    )
+    args = parser.parse_args(argv)
+    ingest_munged(release=args.release)
+    _logger.info(f"stored partitions:\n{partitions()[['release', 'level']].to_string(index=False)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
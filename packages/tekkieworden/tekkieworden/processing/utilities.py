@@ -1,76 +1,216 @@
+import hashlib
 import logging
-import pandas as pd
+import time
 
+import numpy as np
+import pandas as pd
 
-def pandas_join_key_single(left_df, right_df, key, how):
 
-    """
-    perform left join with single key (identical key)
-    """
+_logger = logging.getLogger()
 
-    logging.info(f"left_df shape: {left_df.shape}")
-    logging.info(f"right_df shape: {right_df.shape}")
+MERGE_CATEGORIES = ["left_only", "right_only", "both"]
 
-    logging.info(f"joining on key: {key}")
 
-    joined_df = left_df.merge(right_df, how=how, on=key, indicator=True)
+class JoinReport:
+    """
+    Diagnostics of a single join: row counts, match counts and a sample of the
+    left keys that found no match.
+    """
 
-    logging.info(f"Join result\n{joined_df._merge.value_counts()}")
-    # joined_df = joined_df.drop("_merge", axis=1)
+    def __init__(self, name=None, max_unmatched=50):
+        self.name = name
+        self.max_unmatched = max_unmatched
+        self.how = None
+        self.keys = None
+        self.left_rows = None
+        self.right_rows = None
+        self.rows = None
+        self.left_only = None
+        self.right_only = None
+        self.both = None
+        self.unmatched_keys = []
+        self.seconds = None
+
+    @property
+    def match_ratio(self):
+        """
+        fraction of left rows that found a match
+        """
+        matched = self.both or 0
+        total = matched + (self.left_only or 0)
+        return matched / total if total else None
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "how": self.how,
+            "keys": self.keys,
+            "left_rows": self.left_rows,
+            "right_rows": self.right_rows,
+            "rows": self.rows,
+            "left_only": self.left_only,
+            "right_only": self.right_only,
+            "both": self.both,
+            "match_ratio": self.match_ratio,
+            "unmatched_keys": self.unmatched_keys,
+            "seconds": self.seconds,
+        }
+
+    def __repr__(self):
+        return f"JoinReport({self.as_dict()})"
+
+
+def _as_list(keys):
+    if keys is None:
+        return []
+    return [keys] if isinstance(keys, str) else list(keys)
+
+
+def categorize_keys(left_df, right_df, left_keys, right_keys):
+    """
+    Converts join keys on both sides to categoricals with identical categories,
+    which lets pandas merge on integer codes.
+    :return: left_df, right_df with categorical keys
+    """
+    left_df, right_df = left_df.copy(), right_df.copy()
+    for lk, rk in zip(left_keys, right_keys):
+        categories = pd.Index(pd.unique(np.concatenate([
+            np.asarray(left_df[lk].dropna(), dtype=object),
+            np.asarray(right_df[rk].dropna(), dtype=object),
+        ])))
+        left_df[lk] = pd.Categorical(left_df[lk], categories=categories)
+        right_df[rk] = pd.Categorical(right_df[rk], categories=categories)
+    return left_df, right_df
+
+
+def pandas_join(
+    left_df,
+    right_df,
+    how="inner",
+    on=None,
+    left_on=None,
+    right_on=None,
+    left_index=False,
+    right_index=False,
+    validate=None,
+    report: JoinReport = None,
+    categorical_keys=False,
+    sort=False,
+):
+    """
+    Merge two frames. Match diagnostics (which needs an indicator column) are
+    only computed when a JoinReport is passed or the log level is DEBUG.
+    :param validate: passed to pd.merge, e.g. "one_to_one" or "many_to_one"
+    :param report: JoinReport to fill with the diagnostics
+    :param categorical_keys: merge on categoricals with shared categories
+    :param sort: sort the join keys, off by default as it is not needed for
+        pre-sorted keys
+    :return: joined pd.DataFrame
+    """
+    diagnostics = report is not None or _logger.isEnabledFor(logging.DEBUG)
+    left_keys = _as_list(on if on is not None else left_on)
+    right_keys = _as_list(on if on is not None else right_on)
+    if categorical_keys and left_keys:
+        left_df, right_df = categorize_keys(left_df, right_df, left_keys, right_keys)
 
-    logging.info(f"joined df: {joined_df.shape}")
+    start = time.perf_counter()
+    joined_df = pd.merge(
+        left_df,
+        right_df,
+        how=how,
+        on=on,
+        left_on=left_on,
+        right_on=right_on,
+        left_index=left_index,
+        right_index=right_index,
+        validate=validate,
+        sort=sort,
+        indicator="_merge" if diagnostics else False,
+    )
+    seconds = time.perf_counter() - start
+
+    if diagnostics:
+        report = JoinReport() if report is None else report
+        merge_codes = joined_df["_merge"].cat.codes.values
+        left_only, right_only, both = np.bincount(merge_codes, minlength=3)[:3]
+        unmatched = joined_df.loc[merge_codes == 0]
+        if left_index:
+            unmatched_keys = unmatched.index.drop_duplicates().tolist()
+        elif len(left_keys) == 1:
+            unmatched_keys = unmatched[left_keys[0]].drop_duplicates().tolist()
+        else:
+            unmatched_keys = unmatched[left_keys].drop_duplicates().values.tolist()
+        joined_df = joined_df.drop("_merge", axis=1)
+
+        report.how = how
+        report.keys = left_keys or [str(n) for n in left_df.index.names]
+        report.left_rows, report.right_rows = len(left_df), len(right_df)
+        report.rows = len(joined_df)
+        report.left_only, report.right_only, report.both = (
+            int(left_only), int(right_only), int(both)
+        )
+        report.unmatched_keys = [
+            list(k) if isinstance(k, tuple) else k
+            for k in unmatched_keys[: report.max_unmatched]
+        ]
+        report.seconds = seconds
+        _logger.debug(f"Join result: {report}")
 
     return joined_df
 
 
-def pandas_join_key_dual(left_df, right_df, left_key, right_key, how):
-
+def pandas_join_key_single(left_df, right_df, key, how, validate=None, report=None):
     """
-    perform join with dual keys (multiple)
+    perform join with single key (identical key)
     """
+    return pandas_join(left_df, right_df, how=how, on=key, validate=validate, report=report)
 
-    logging.info(f"left_df shape: {left_df.shape}")
-    logging.info(f"right_df shape: {right_df.shape}")
-
-    logging.info(f"joining on left_key: {left_key}")
-    logging.info(f"joining on right_key: {right_key}")
 
-    joined_df = left_df.merge(
-        right_df, how=how, left_on=left_key, right_on=right_key, indicator=True
+def pandas_join_key_dual(left_df, right_df, left_key, right_key, how, validate=None, report=None):
+    """
+    perform join with dual keys (multiple)
+    """
+    return pandas_join(
+        left_df,
+        right_df,
+        how=how,
+        left_on=left_key,
+        right_on=right_key,
+        validate=validate,
+        report=report,
     )
-    # validate='one_to_many')
-
-    logging.info(f"Join result\n{joined_df._merge.value_counts()}")
-    # joined_df = joined_df.drop("_merge", axis=1)
 
-    logging.info(f"joined df: {joined_df.shape}")
 
-    return joined_df
-
-
-def pandas_join_on_index(left_df, right_df, how="inner"):
+def pandas_join_on_index(left_df, right_df, how="inner", validate=None, report=None):
     """
     Perform join on identical indices.
     Args:
         left_df:
         right_df:
         how:
+        validate: passed to pd.merge, e.g. "one_to_one"
+        report: JoinReport to fill with match diagnostics
     Returns:
     """
-
-    logging.info(f"left_df shape: {left_df.shape}")
-    logging.info(f"right_df shape: {right_df.shape}")
-
-    logging.info(f"joining on left_indices: {[i for i in left_df.index.names]}")
-    logging.info(f"joining on left_key: {[i for i in right_df.index.names]}")
-
-    joined_df = pd.merge(
-        left_df, right_df, how=how, left_index=True, right_index=True, indicator=True
+    return pandas_join(
+        left_df,
+        right_df,
+        how=how,
+        left_index=True,
+        right_index=True,
+        validate=validate,
+        report=report,
     )
 
-    logging.info(f"Join result\n\t{joined_df._merge.value_counts()}")
-    joined_df = joined_df.drop("_merge", axis=1)
-
-    logging.info(f"joined df: {joined_df.shape}")
 
-    return joined_df
+def file_sha256(path, chunk_size=1024 * 1024) -> str:
+    """
+    Content hash of a file, read in chunks.
+    :param path: file to hash
+    :return: hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -1,49 +1,9 @@
-import seaborn as sns
 import pandas as pd
-import numpy as np
 import re
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MaxNLocator
-import math
 
-spark_chars = u"▁▂▃▄▅▆▇█"
-"""Eight unicode characters of (nearly) steadily increasing height."""
-
-
-def _isan(n):
-    return not math.isnan(n)
-
-
-def create_spark_charts(series, minimum=None, maximum=None):
-    """
-    Converts pd.Series to a sparkline string.
-
-    Example:
-    >>> create_spark_charts([ 0.5, 1.2, 3.5, 7.3, 8.0, 12.5, float("nan"), 15.0, 14.2,\
-    11.8, 6.1 1.9 ])
-    u'▁▁▂▄▅▇ ██▆▄▂'
-    Raises ValueError if input data cannot be converted to float.
-    Raises TypeError if series is not an iterable.
-    """
-    series = [float(n) for n in series]
-    if all(math.isnan(n) for n in series):
-        return u" " * len(series)
-
-    minimum = min(filter(_isan, series)) if minimum is None else minimum
-    maximum = max(filter(_isan, series)) if maximum is None else maximum
-    data_range = maximum - minimum
-    if data_range == 0.0:
-        # Graph a baseline if every input value is equal.
-        return u"".join([spark_chars[0] for i in series])
-    coefficient = (len(spark_chars) - 1.0) / data_range
-
-    def clamp(n):
-        return min(max(n, minimum), maximum)
-
-    def spark_for(n):
-        return spark_chars[int(round(clamp(n) - minimum) * coefficient)]
-
-    return u"".join(spark_for(n) if _isan(n) else " " for n in series)
+from tekkieworden.processing.readers import year_columns
 
 
 def melt_plot_facet_grid(input_df, dim: str, sexe: str,
@@ -58,21 +18,9 @@ def melt_plot_facet_grid(input_df, dim: str, sexe: str,
     :param groupby_var: value to groupby on
     :return: melted pd.DataFrame or FacetGrid
     """
-    dim = dim
-    # years differ per ingeschrevenen or gediplomeerden and per update. fix:
-    dim_list = input_df.filter(regex=rf'_{dim}$').columns.tolist()
-    years = np.unique(list(map(lambda sub: int(''.join(
-        [x for x in sub if x.isnumeric()])), dim_list)))
-
-    if sexe == 'man':
-        dim_cols = [f"{years[0]}_man_{dim}", f"{years[1]}_man_{dim}", f"{years[2]}_man_{dim}",
-                    f"{years[3]}_man_{dim}", f"{years[4]}_man_{dim}"]
-    elif sexe == 'vrouw':
-        dim_cols = [f"{years[0]}_vrouw_{dim}", f"{years[1]}_vrouw_{dim}", f"{years[2]}_vrouw_{dim}",
-                    f"{years[3]}_vrouw_{dim}", f"{years[4]}_vrouw_{dim}"]
-    elif sexe == 'total':
-        dim_cols = [f"{years[0]}_tot_{dim}", f"{years[1]}_tot_{dim}", f"{years[2]}_tot_{dim}",
-                    f"{years[3]}_tot_{dim}", f"{years[4]}_tot_{dim}"]
+    # years differ per ingeschrevenen or gediplomeerden and per update
+    gender = "tot" if sexe == "total" else sexe
+    dim_cols = year_columns(input_df.columns, gender=gender, suffix=f"_{dim}")
 
     id_vars = [groupby_var, hue_var]
     value_name = "".join(["ingeschreven" if x == 'i' else 'gediplomeerden' for x in dim])
@@ -101,6 +49,8 @@ def melt_plot_facet_grid(input_df, dim: str, sexe: str,
     melt_frame[sexe] = melt_frame[sexe].astype(int)
 
     if plot_facet_grid:
+        # seaborn is slow to import and only needed here
+        import seaborn as sns
 
         no = len(melt_frame[hue_var].unique())
         palette = dict(zip(melt_frame[hue_var].unique(), sns.color_palette("rocket_r", no)))
@@ -1,4 +1,5 @@
 import logging
+import re
 import yaml
 import pandas as pd
 from typing import List
@@ -23,6 +24,72 @@ def write_df_csv(input_df, filename):
     input_df.to_csv(destination, index=False)
 
 
+MUNGED_EXTENSIONS = {"parquet": ".parquet", "feather": ".feather", "csv": ".csv"}
+
+
+def munged_path(name, fmt=None, path=None) -> str:
+    """
+    :param name: name of the munged dataset without extension, e.g. config.MUNGED_TOTAL
+    :param fmt: "parquet", "feather" or "csv", defaults to config.MUNGED_FORMAT
+    :param path: directory, defaults to MUNGED data folder
+    :return: full path of the munged dataset
+    """
+    fmt = config.MUNGED_FORMAT if fmt is None else fmt
+    path = config.PATH_TO_MUNGED_DATA if path is None else path
+    return f"{path}/{name}{MUNGED_EXTENSIONS[fmt]}"
+
+
+def apply_munged_schema(input_df) -> pd.DataFrame:
+    """
+    Casts the munged dataset to its explicit schema: code columns to strings
+    (a float code like 22166.0 becomes '22166'), year figures to float64.
+    :param input_df: munged pd.DataFrame
+    :return: pd.DataFrame with fixed dtypes
+    """
+    df = input_df.copy()
+    for col in config.MUNGED_CODE_COLS:
+        if col in df.columns:
+            if pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].astype("Int64")
+            df[col] = df[col].astype(str).where(df[col].notnull())
+    count_cols = [c for c in df.columns if re.match(config.MUNGED_COUNT_REGEX, str(c))]
+    df[count_cols] = df[count_cols].astype("float64")
+    return df
+
+
+def write_df(input_df, name, fmt=None, export_csv=None, path=None) -> List[str]:
+    """
+    Write a munged pd.Dataframe with an explicit schema to parquet, feather or csv
+    :param input_df: pd.Dataframe to be saved
+    :param name: name of the dataset without extension
+    :param fmt: "parquet", "feather" or "csv", defaults to config.MUNGED_FORMAT
+    :param export_csv: also write a csv copy, defaults to config.MUNGED_EXPORT_CSV
+    :param path: directory, defaults to MUNGED data folder
+    :return: list of written files
+    """
+    fmt = config.MUNGED_FORMAT if fmt is None else fmt
+    export_csv = config.MUNGED_EXPORT_CSV if export_csv is None else export_csv
+    df = apply_munged_schema(input_df).reset_index(drop=True)
+
+    destination = munged_path(name, fmt=fmt, path=path)
+    logging.info(f"Writing {len(df)} records to {destination}")
+    if fmt == "parquet":
+        df.to_parquet(destination, index=False)
+    elif fmt == "feather":
+        df.to_feather(destination)
+    elif fmt == "csv":
+        df.to_csv(destination, index=False)
+    else:
+        raise ValueError(f"unknown format: {fmt}, choose from {list(MUNGED_EXTENSIONS)}")
+
+    written = [destination]
+    if export_csv and fmt != "csv":
+        csv_destination = munged_path(name, fmt="csv", path=path)
+        df.to_csv(csv_destination, index=False)
+        written.append(csv_destination)
+    return written
+
+
 def write_ho_techlabel_excel_to_yaml(input_df, filename):
     """
     writes clusters_ho_tech_labeling.xlsx provided by Tekkieworden to yaml file
@@ -31,7 +98,7 @@ def write_ho_techlabel_excel_to_yaml(input_df, filename):
     :return: yaml file (dict)
     """
     tech = pd.read_excel(input_df, usecols=[1, 2, 3]).fillna("no_tech")
-    tech["tech"] = tech["tech"].apply(lambda x: x.lower())
+    tech["tech"] = tech["tech"].str.lower()
     tech_yaml = (
         tech[["opleidingsnaam_duo", "tech"]].set_index("opleidingsnaam_duo").to_dict()
     )
@@ -48,7 +115,7 @@ def write_mbo_techlabel_excel_to_yaml(input_df, filename):
     :return: yaml file (dict)
     """
     tech = pd.read_excel(input_df, usecols=[0, 1]).fillna("no_tech")
-    tech["tech"] = tech["tech"].apply(lambda x: x.lower())
+    tech["tech"] = tech["tech"].str.lower()
     tech_yaml = (
         tech[["mbo_opleiding", "tech"]].set_index("mbo_opleiding").to_dict()
     )
@@ -0,0 +1,155 @@
+"""
+Aggregation api over the munged cubes, shared by every dashboard session.
+
+    python tekkieworden/serve.py --port 8765 --workers 8
+    TEKKIEWORDEN_API_URL=http://127.0.0.1:8765 streamlit run visual_app.py
+
+GET endpoints, all answer json and take level (ho, mbo), dimension, measure
+(ingeschrevenen, gediplomeerden) as query parameters:
+ - /top?gender=tot&year=2019&n=15    largest dimension values of a year (year=all
+   sums all years, values=a&values=b ranks only those values)
+ - /timeseries?gender=tot&values=a&values=b    counts per year
+ - /gender?year=2019    man, vrouw and tot per dimension value
+ - /health    cube versions and cache stats
+"""
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from tekkieworden import dashboard_data
+from tekkieworden.config import config
+from tekkieworden.processing.render_cache import RenderCache
+
+
+_logger = logging.getLogger(__name__)
+
+# query parameters that may be repeated
+LIST_PARAMS = {"values"}
+
+# encoded responses keyed on (endpoint, params, cube versions)
+responses = RenderCache(maxsize=config.SERVE_CACHE_SIZE)
+
+
+def parse_params(query: str) -> dict:
+    """
+    :return: dict of query parameters. A blank list parameter (values=) is an
+        empty selection, other blank parameters are left out
+    """
+    params = {}
+    for name, values in parse_qs(query, keep_blank_values=True).items():
+        if name in LIST_PARAMS:
+            params[name] = [v for v in values if v != ""]
+        elif values[-1] != "":
+            params[name] = values[-1]
+    return params
+
+
+def cache_key(endpoint, params) -> tuple:
+    items = tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items()))
+    return endpoint, items, dashboard_data.cube_versions()
+
+
+def respond(endpoint, params) -> bytes:
+    """
+    :return: json of the query result, cached across requests
+    """
+    query = dashboard_data.QUERIES[endpoint]
+    return responses.get_or_render(
+        cache_key(endpoint, params),
+        lambda: json.dumps(dashboard_data.to_payload(query(**params))).encode(),
+    )
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlsplit(self.path)
+        endpoint = url.path.strip("/")
+        if endpoint == "health":
+            health = {"status": "ok", "data_version": dashboard_data.cube_versions(), "cache": responses.stats()}
+            return self._send(200, json.dumps(health).encode())
+        if endpoint not in dashboard_data.QUERIES:
+            return self._error(404, f"unknown endpoint /{endpoint}, use one of {sorted(dashboard_data.QUERIES)}")
+        try:
+            body = respond(endpoint, parse_params(url.query))
+        except FileNotFoundError as e:
+            return self._error(503, str(e))
+        except KeyError as e:
+            return self._error(400, f"unknown level, dimension, measure, gender or year: {e}")
+        except (TypeError, ValueError) as e:
+            return self._error(400, str(e))
+        self._send(200, body)
+
+    def _error(self, status, message):
+        self._send(status, json.dumps({"error": message}).encode())
+
+    def _send(self, status, body: bytes):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        _logger.debug(f"{self.address_string()} {format % args}")
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer handling requests on a fixed pool of worker threads, so a burst
+    of dashboard sessions does not start a thread per request.
+    """
+
+    # connections queued while all workers are busy, HTTPServer defaults to 5
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers=config.SERVE_WORKERS):
+        super().__init__(server_address, handler_class)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="serve")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def make_server(host=config.SERVE_HOST, port=config.SERVE_PORT, workers=config.SERVE_WORKERS) -> PooledHTTPServer:
+    """
+    :param port: 0 picks a free port, see server.server_address
+    """
+    return PooledHTTPServer((host, port), Handler, workers=workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="serve the dashboard aggregates as json")
+    parser.add_argument("--host", default=config.SERVE_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=config.SERVE_WORKERS)
+    args = parser.parse_args(argv)
+
+    dashboard_data.load_cubes()
+    server = make_server(args.host, args.port, args.workers)
+    _logger.info(f"serving on http://{args.host}:{server.server_address[1]} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
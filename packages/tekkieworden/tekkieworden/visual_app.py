@@ -1,145 +1,95 @@
-import matplotlib.pyplot as plt
-from matplotlib.ticker import StrMethodFormatter
-import pandas as pd
 import streamlit as st
-import altair as alt
+from tekkieworden import dashboard_data
 from tekkieworden.config import config
-from tekkieworden.processing.munge import prepare_mbo_file
-from tekkieworden.processing.readers import open_tech_label_yaml
-from tekkieworden.processing.visual_helpers import remove_borders, add_value_labels
 
-groupby_cols = ['instellingsnaam_duo', 'opleidingsnaam_duo',
-                'ho_type', 'tech_label', 'soortopleiding_duo']
+# load the cubes while the page renders, a no-op on reruns and when the
+# queries go to the api of serve.py (TEKKIEWORDEN_API_URL)
+dashboard_data.warm(background=True)
 
-@st.cache
-def load_data_mbo():
+groupby_cols = config.CUBE_HO_DIMENSIONS
 
-    mbo_opl_agg = prepare_mbo_file(groupby_col = 'tech_label')
-    return mbo_opl_agg
 
-@st.cache
-def load_data_ho():
+def aggregate_years(level, measure, dimvar):
+    # precomputed in the cube, a lookup per widget change
+    return dashboard_data.time_series(level, dimvar, measure).rename(columns=str)
 
-    data = pd.read_csv(str(config.PATH_TO_MUNGED_DATA) + "/opleidingen_tech_filtered.csv")
-    agg_i_cols = data.filter(regex="tot_i", axis=1).columns.tolist()
-    agg_d_cols = data.filter(regex="tot_d", axis=1).columns.tolist()
-    data = data.groupby(groupby_cols)[agg_i_cols + agg_d_cols].sum().reset_index()
-    return agg_i_cols, agg_d_cols, data
 
-# app
-st.title('Tech Studies NL aanbod')
-st.markdown("""\
-        This app illustrates the supply side of tech studies in the Netherlands
-    """)
-st.image(str(config.PATH_TO_PICS) + "/tech_profielen.png", width=300)\
+def render_figure(measure, dimvar, filter_vars) -> bytes:
+    """
+    Draws the ho, mbo and top 15 plots of a measure as png. Uses a Figure
+    instead of pyplot's global state, so sessions can render concurrently.
+    """
+    # plotting libraries are imported on the first render, not on page load
+    from io import BytesIO
+    from matplotlib.figure import Figure
+    from matplotlib.ticker import StrMethodFormatter
+    from tekkieworden.processing.visual_helpers import remove_borders
 
-analysis = st.sidebar.selectbox("Choose Analysis", ["Ingeschrevenen", "Gediplomeerden"])
+    agg_df = aggregate_years('ho', measure, dimvar)
 
-dimvar = st.sidebar.selectbox("select dimension", (groupby_cols))
+    # matplotlib grid spec
+    f = Figure(figsize=(12, 8))
+    f.subplots_adjust(hspace=.4)
+    grid = f.add_gridspec(3, 2)
+    ax1 = f.add_subplot(grid[:2, 0])
+    ax2 = f.add_subplot(grid[:2, 1])
+    ax3 = f.add_subplot(grid[2, :])
+    line_specs = {'kind': 'line', 'marker': 'o', 'cmap': 'Set1', 'alpha': .6}
+    hline_specs= {'c': 'darkgray', 'linewidth':2, 'zorder': 0, 'alpha': .8, 'linestyle' : "--"}
+    legend_specs = {'loc': 'best', 'ncol': 2, 'frameon': False}
 
-# matplotlib grid spec
-f = plt.figure(figsize=(12, 8))
-plt.subplots_adjust(hspace=.4)
-gridsize = (3, 2)
-ax1 = plt.subplot2grid(gridsize, (0, 0), colspan=1, rowspan=2)
-ax2 = plt.subplot2grid(gridsize, (0, 1), colspan=1, rowspan=2)
-ax3 = plt.subplot2grid(gridsize, (2, 0), colspan=2)
-line_specs = {'kind': 'line', 'marker': 'o', 'cmap': 'Set1', 'alpha': .6}
-hline_specs= {'c': 'darkgray', 'linewidth':2, 'zorder': 0, 'alpha': .8, 'linestyle' : "--"}
-legend_specs = {'loc': 'best', 'ncol': 2, 'frameon': False}
-
-if analysis == "Ingeschrevenen":
     # data plot 1
-    agg_i_cols, _ , df = load_data_ho()
-    filter_vars = st.sidebar.multiselect(
-                f"Select {dimvar}",
-                df[dimvar].unique())
-
-    rename_dict = {'2015_tot_i': '2015',
-                   '2016_tot_i': '2016',
-                   '2017_tot_i': '2017',
-                   '2018_tot_i': '2018',
-                   '2019_tot_i': '2019'}
-    agg_cols = ['2015', '2016', '2017', '2018', '2019']
-
-    agg_df = df.groupby([dimvar])[agg_i_cols].sum().reset_index()
-    agg_df = agg_df.rename(columns=rename_dict)
-    agg_melt = pd.melt(frame=agg_df, id_vars=dimvar,
-                       value_vars=agg_cols, value_name='ingeschrevenen')
-
     for name in filter_vars:
-        plotset = agg_df[agg_df[dimvar] == name][agg_cols].reset_index(drop=True).T.rename(columns={0: name})
+        plotset = agg_df.loc[[name]].T
         plotset.plot(ax=ax1, label=name, **line_specs)
-    ax1.legend(**legend_specs)
+    if filter_vars:
+        ax1.legend(**legend_specs)
     ax1.set(title='ho')
     # data plot 2
-    mbo_opl_agg = load_data_mbo()
+    mbo_opl_agg = aggregate_years('mbo', measure, 'tech_label')
     mbo_opl_agg.T.plot(ax=ax2, **line_specs)
     ax2.set(title='mbo')
     # data plot 3
-    top = df.groupby([dimvar])['2019_tot_i'].sum().sort_values(ascending=False)
-    mean_ = top.mean()
-    top15 = top[:15].to_frame().rename(columns={'2019_tot_i': 'ingeschrevenen'})
+    mean_ = agg_df.iloc[:, -1].mean()
+    top15 = dashboard_data.top_n('ho', dimvar, measure, n=15)
     top15.plot(kind='bar', ax=ax3, color='indianred', alpha=.4)
     ax3.axhline(y=mean_, **hline_specs)
     # add_value_labels(ax=ax3, spacing=-30)
-    ax3.set(ylim=(0, (1.2 * top15.ingeschrevenen.max())))
+    ax3.set(ylim=(0, (1.2 * top15[measure].max())))
     ax3.grid(axis="y", linestyle="--")
 
     for ax in [ax1, ax2, ax3]:
-        _ = plt.setp(ax.get_xticklabels(), fontsize=12)
+        ax.tick_params(axis='x', labelsize=12)
         remove_borders(ax)
         ax.get_yaxis().set_major_formatter(StrMethodFormatter('{x:,.0f}'))
     for ax in [ax1, ax2]:
-        _ = plt.setp(ax.get_xticklabels(), rotation='horizontal')
+        ax.tick_params(axis='x', labelrotation=0)
 
-    st.pyplot()
+    png = BytesIO()
+    f.savefig(png, format='png')
+    return png.getvalue()
 
-elif analysis == "Gediplomeerden":
 
-    _, agg_d_cols, df = load_data_ho()
-    filter_vars = st.sidebar.multiselect(
-                f"Select {dimvar}",
-                df[dimvar].unique())
+# app
+st.title('Tech Studies NL aanbod')
+st.markdown("""\
+        This app illustrates the supply side of tech studies in the Netherlands
+    """)
+st.image(str(config.PATH_TO_PICS) + "/tech_profielen.png", width=300)\
 
-    rename_dict = {'2014_tot_d': '2014',
-                   '2015_tot_d': '2015',
-                   '2016_tot_d': '2016',
-                   '2017_tot_d': '2017',
-                   '2018_tot_d': '2018'}
-    agg_cols = ['2014', '2015', '2016', '2017', '2018']
-    # data plot 1
-    agg_df = df.groupby([dimvar])[agg_d_cols].sum().reset_index()
-    agg_df = agg_df.rename(columns=rename_dict)
-    agg_melt = pd.melt(frame=agg_df, id_vars=dimvar,
-                       value_vars=agg_cols, value_name='gediplomeerden')
-    for name in filter_vars:
-        plotset = agg_df[agg_df[dimvar] == name][agg_cols].reset_index(drop=True).T.rename(columns={0: name})
-        plotset.plot(ax=ax1, label=name, **line_specs)
-    ax1.legend(**legend_specs)
-    ax1.set(title='ho')
-    # data plot 2
-    mbo_opl_agg = load_data_mbo()
-    mbo_opl_agg.T.plot(ax=ax2, **line_specs)
-    ax2.set(title='mbo')
-    # data plot 3
-    top = df.groupby([dimvar])['2018_tot_d'].sum().sort_values(ascending=False)
-    mean_ = top.mean()
-    top15 = top[:15].to_frame().rename(columns={'2018_tot_d': 'gediplomeerden'})
-    top15.plot(kind='bar', ax=ax3, color='indianred', alpha=.4)
-    ax3.axhline(y=mean_, **hline_specs)
-    # add_value_labels(ax=ax3, spacing=-30)
-    ax3.set(ylim=(0, (1.2 * top15.gediplomeerden.max())))
-    ax3.grid(axis="y", linestyle="--")
+analysis = st.sidebar.selectbox("Choose Analysis", ["Ingeschrevenen", "Gediplomeerden"])
 
-    for ax in [ax1, ax2, ax3]:
-        _ = plt.setp(ax.get_xticklabels(), fontsize=12)
-        remove_borders(ax)
-        ax.get_yaxis().set_major_formatter(StrMethodFormatter('{x:,.0f}'))
-    for ax in [ax1, ax2]:
-        _ = plt.setp(ax.get_xticklabels(), rotation='horizontal')
+dimvar = st.sidebar.selectbox("select dimension", (groupby_cols))
+
+measure = analysis.lower()
+agg_df = aggregate_years('ho', measure, dimvar)
+filter_vars = st.sidebar.multiselect(
+            f"Select {dimvar}",
+            agg_df.index)
 
-    st.pyplot()
+# repeated views and other sessions with the same widget state reuse the png
+key = ('visual_app', measure, dimvar, tuple(filter_vars), dashboard_data.data_version())
+st.image(dashboard_data.charts.get_or_render(key, lambda: render_figure(measure, dimvar, filter_vars)))
 
 
 if st.sidebar.checkbox("Show Data"):
@@ -148,7 +98,7 @@ if st.sidebar.checkbox("Show Data"):
 
 if st.sidebar.checkbox("summary"):
     st.markdown("### Summary")
-    st.text('summary')
+    st.write(dashboard_data.gender_breakdown('ho', dimvar, measure).loc[filter_vars])
 
 st.info("""\
         [Tekkieworden Github repo](https://github.com/rmania/tekkieworden) 
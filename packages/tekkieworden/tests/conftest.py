@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def munged():
+    """
+    A few opleidingen as munge.py writes them: hbo and wo rows, a list
+    column and missing figures.
+    """
+    return pd.DataFrame(
+        {
+            "ho_type": ["hbo", "hbo", "wo", "wo"],
+            "brinnummer_duo": ["25BE", "25BE", "21PC", "21PC"],
+            "opleidingscode_duo": ["34267", "50009", "34267", "60021"],
+            "tech_label": ["data", "software", "data", "security"],
+            "gemeentenummer_duo": [["0106"], ["0106"], ["0363"], ["0363"]],
+            "2018_man_i": [31.0, np.nan, 4.0, np.nan],
+            "2018_tot_i": [34.0, 2.0, 9.0, 4.0],
+            "2019_tot_i": [1.0, 3.0, 10.0, 20.0],
+            "2018_tot_d": [5.0, np.nan, 1.0, np.nan],
+        }
+    )
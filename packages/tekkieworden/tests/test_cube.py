@@ -0,0 +1,23 @@
+import numpy as np
+
+from tekkieworden.processing.cube import build_cube, index_cube
+from tekkieworden.processing.facts import build_facts, pivot_years
+
+
+def test_cube_rollups_match_fact_table_aggregates(munged):
+    # an opleiding without tech label is left out of the tech_label rollups
+    facts_and_dims = build_facts(munged.assign(tech_label=["data", "software", None, "security"]))
+    rollups = index_cube(build_cube(facts_and_dims, dimensions=["ho_type", "tech_label"]))
+
+    assert set(rollups) == {
+        (dim, measure, gender)
+        for dim in ["ho_type", "tech_label"]
+        for measure, gender in [("ingeschrevenen", "man"), ("ingeschrevenen", "tot"), ("gediplomeerden", "tot")]
+    }
+    for dim in ["ho_type", "tech_label"]:
+        expected = pivot_years(*facts_and_dims, "ingeschrevenen", by=[dim])
+        np.testing.assert_array_equal(rollups[(dim, "ingeschrevenen", "tot")].to_numpy(), expected.to_numpy())
+
+    by_type = rollups[("ho_type", "gediplomeerden", "tot")]
+    assert list(by_type.columns) == [2018]
+    assert by_type.loc["hbo", 2018] == 5.0
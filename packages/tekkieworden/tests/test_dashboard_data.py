@@ -0,0 +1,17 @@
+from tekkieworden import dashboard_data
+from tekkieworden.config import config
+from tekkieworden.processing.cube import build_cube
+from tekkieworden.processing.facts import build_facts
+from tekkieworden.processing.writers import write_df
+
+
+def test_dashboard_data_caches_rollups_per_cube_version(munged, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PATH_TO_MUNGED_DATA", tmp_path)
+    monkeypatch.setattr(dashboard_data, "_cubes", {})
+    write_df(build_cube(build_facts(munged), ["tech_label"]), name=config.MUNGED_HO_CUBE, export_csv=False)
+
+    dashboard_data.warm(background=True).join()
+
+    table = dashboard_data.rollup("ho", "tech_label", "ingeschrevenen")
+    assert table.loc["data"].tolist() == [43.0, 11.0]
+    assert dashboard_data.rollups("ho") is dashboard_data.rollups("ho")
@@ -0,0 +1,28 @@
+import numpy as np
+
+from tekkieworden.processing.facts import build_facts, pivot_years, year_series
+
+
+def test_build_facts_has_sorted_index_and_dimensions(munged):
+    facts, dims = build_facts(munged)
+
+    assert list(facts.index.names) == ["measure", "gender", "year", "opleiding_id"]
+    assert facts.index.is_monotonic_increasing
+    assert len(facts) == 12  # missing figures are no facts
+    assert list(dims.columns) == ["ho_type", "brinnummer_duo", "opleidingscode_duo", "tech_label"]
+    assert facts.loc[("ingeschrevenen", "man", 2018, 0), "count"] == 31.0
+
+
+def test_pivot_years_matches_groupby_on_wide_columns(munged):
+    facts, dims = build_facts(munged)
+
+    table = pivot_years(facts, dims, "ingeschrevenen", by=["tech_label"])
+    expected = munged.groupby("tech_label")[["2018_tot_i", "2019_tot_i"]].sum()
+    assert list(table.columns) == [2018, 2019]
+    np.testing.assert_array_equal(table.to_numpy(), expected.to_numpy())
+
+    long_df = year_series(facts, dims, "gediplomeerden", by=["brinnummer_duo"], years=[2018])
+    assert long_df.to_dict("records") == [
+        {"brinnummer_duo": "21PC", "year": 2018, "gediplomeerden": 1.0},
+        {"brinnummer_duo": "25BE", "year": 2018, "gediplomeerden": 5.0},
+    ]
@@ -0,0 +1,25 @@
+import pandas as pd
+
+from tekkieworden.processing.fuzzy import FuzzyLabelMatcher
+from tekkieworden.processing.label_index import LabelIndex
+
+
+def test_propose_labels_for_renamed_opleidingen():
+    index = LabelIndex(
+        {
+            "Informatica": "developer",
+            "Technische Informatica": "developer",
+            "Data Science en Artificial Intelligence": "data",
+            "Rechtsgeleerdheid": "no_tech",
+        }
+    )
+    matcher = FuzzyLabelMatcher(index, max_df=0.5)
+
+    candidates = matcher.propose(
+        pd.Series(["Informatica", "Data Science & Artificial Intelligence", "Bedrijfskunde"])
+    )
+
+    best = candidates[candidates["rank"] == 1].set_index("name")
+    assert "Informatica" not in best.index
+    assert best.loc["Data Science & Artificial Intelligence", "candidate_label"] == "data"
+    assert (candidates.score >= 0.5).all()
@@ -0,0 +1,18 @@
+import pandas as pd
+
+from tekkieworden.processing.keywords import KeywordMatcher
+
+
+def test_match_columns_merges_all_columns():
+    df = pd.DataFrame(
+        {
+            "opleidingsnaam_duo": ["Data Science", "Rechtsgeleerdheid", None],
+            "naamopleidingengels_sdb": ["Data Science", "Law", "Software Engineering"],
+        }
+    )
+    matcher = KeywordMatcher(["data", "data science", "software", "engineer", "data"])
+
+    result = matcher.match_columns(df, ["opleidingsnaam_duo", "naamopleidingengels_sdb"])
+
+    assert result.tech_keyword_opleidingsnaam_duo.tolist() == ["data science", "", ""]
+    assert result.tech_keyword.tolist() == ["data science", "", "software, engineer"]
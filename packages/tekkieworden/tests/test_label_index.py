@@ -0,0 +1,12 @@
+import pandas as pd
+
+from tekkieworden.processing.label_index import LabelIndex
+
+
+def test_lookup_ignores_case_and_whitespace():
+    index = LabelIndex({"Data Science": "data", "HBO-ICT": "developer", "Rechten": "no_tech"})
+
+    labels = index.lookup(pd.Series(["data  science", " HBO-ICT", "Onbekend", None]))
+
+    assert labels.tolist() == ["data", "developer", "no_tech", "no_tech"]
+    assert labels.dtype == "category"
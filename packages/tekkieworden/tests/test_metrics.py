@@ -0,0 +1,52 @@
+import json
+
+import pandas as pd
+
+from tekkieworden.processing import metrics
+from tekkieworden.processing.pipeline import Pipeline, Stage
+from tekkieworden.processing.utilities import pandas_join_key_single
+
+
+def join_stage():
+    left = pd.DataFrame({"brinnummer_duo": ["21PC", "25BE"], "n": [1, 2]})
+    right = pd.DataFrame({"brinnummer_duo": ["21PC"], "gemeente": ["0106"]})
+    metrics.record("dropped", "opleidingen_d", count=0, names=[])
+    return pandas_join_key_single(
+        left, right, key="brinnummer_duo", how="left", report=metrics.join_report("gemeentes")
+    )
+
+
+def test_helpers_are_noops_without_collector():
+    assert metrics.join_report("gemeentes") is None
+    metrics.record("dropped", "opleidingen_d", count=1)
+
+
+def test_pipeline_collects_and_caches_stage_metrics(tmp_path):
+    pipeline = Pipeline([Stage("joined", join_stage)], cache_dir=tmp_path / "cache")
+
+    pipeline.run()
+    join = [r for r in pipeline.metrics.as_records() if r["kind"] == "join"][0]
+    assert (join["stage"], join["name"], join["left_only"]) == ("joined", "gemeentes", 1)
+    assert join["unmatched_keys"] == ["25BE"]
+    assert not join["cached"]
+
+    pipeline = Pipeline([Stage("joined", join_stage)], cache_dir=tmp_path / "cache")
+    pipeline.run()
+    records = pipeline.metrics.as_records()
+    assert {r["kind"] for r in records} == {"dropped", "join", "stage"}
+    assert all(r["cached"] for r in records)
+
+    destination = pipeline.metrics.write(tmp_path / "reports" / "run.json")
+    with open(destination) as f:
+        assert json.load(f) == records
+    pipeline.metrics.write(tmp_path / "reports" / "run.parquet")
+    assert len(pd.read_parquet(tmp_path / "reports" / "run.parquet")) == len(records)
+
+
+def test_timed_records_the_wall_time_of_the_block():
+    with metrics.collecting(stage="joined") as collector:
+        with metrics.timed("stage", "joined", pid=1) as timing:
+            pass
+    record = collector.as_records()[0]
+    assert (record["kind"], record["name"], record["pid"]) == ("stage", "joined", 1)
+    assert record["seconds"] == timing["seconds"] >= 0
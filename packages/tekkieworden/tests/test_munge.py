@@ -0,0 +1,35 @@
+import pandas as pd
+
+from tekkieworden.config import config
+from tekkieworden.processing.munge import aggregate_mbo_file
+
+
+HEADER = "BRIN NUMMER;KWALIFICATIE CODE;KWALIFICATIE NAAM;MAN2018;VROUW2018;TOTAAL2018\n"
+ROWS = [
+    "00GT;25180;Software developer;3;1;4\n",
+    "25LJ;25187;Medewerker ICT;2;0;2\n",
+    "00GT;25180;Software developer;1;1;2\n",
+    "27XR;25604;Netwerkbeheerder;5;1;6\n",
+    "25LJ;25187;Medewerker ICT;1;1;2\n",
+]
+
+
+def test_chunked_aggregate_equals_one_block(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PATH_TO_RAW_DATA", tmp_path)
+    (tmp_path / "mbo.csv").write_text(HEADER + "".join(ROWS))
+
+    chunked = aggregate_mbo_file("mbo.csv", "mbo_i", chunksize=2)
+    one_block = aggregate_mbo_file("mbo.csv", "mbo_i", chunksize=len(ROWS))
+
+    pd.testing.assert_frame_equal(chunked, one_block)
+    assert chunked.loc[("00GT", "25180", "Software developer"), "2018_tot_i"] == 6
+
+
+def test_aggregate_of_a_file_without_rows_is_empty(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PATH_TO_RAW_DATA", tmp_path)
+    (tmp_path / "mbo.csv").write_text(HEADER)
+
+    agg = aggregate_mbo_file("mbo.csv", "mbo_i", chunksize=2)
+
+    assert agg.empty
+    assert list(agg.columns) == ["2018_man_i", "2018_vrouw_i", "2018_tot_i"]
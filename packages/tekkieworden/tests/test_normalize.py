@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from tekkieworden.processing.normalize import normalize_codes, lower, strip_first_word, mbo_column_mapping
+
+
+def test_normalize_codes_drops_decimal_part():
+    codes = normalize_codes(pd.Series([34267.0, None, 34267.0]))
+
+    assert codes[0] == "34267"
+    assert codes.isnull()[1]
+
+
+def test_strip_first_word_and_lower_work_on_uniques():
+    names = pd.Series(["B Elektrotechniek", "M Data Science", "B Elektrotechniek", "AD"])
+
+    stripped = strip_first_word(names)
+
+    assert stripped.tolist()[:3] == ["Elektrotechniek", "Data Science", "Elektrotechniek"]
+    assert stripped.isnull()[3]
+    assert lower(stripped).cat.categories.tolist() == ["elektrotechniek", "data science"]
+
+
+def test_mbo_column_mapping_covers_any_year_range():
+    header = ("BRIN NUMMER", "KWALIFICATIE CODE", "MAN2021", "VROUW2021", "TOTAAL2021",
+              "DIPMAN2018", "DIPVRW2018", "DIPTOTAAL2018")
+
+    mapping = mbo_column_mapping(header)
+
+    assert mapping["BRIN NUMMER"] == "brin_nummer"
+    assert [mapping[c] for c in header[2:]] == [
+        "2021_man_i", "2021_vrouw_i", "2021_tot_i", "2018_man_d", "2018_vrouw_d", "2018_tot_d"
+    ]
+    with pytest.raises(ValueError):
+        mbo_column_mapping(("VROUW2019", "VRW2019"))
@@ -0,0 +1,172 @@
+from functools import partial
+
+from tekkieworden.processing.pipeline import Pipeline, Stage
+
+
+CALLS = []
+
+
+def read_number(path):
+    CALLS.append(path.split("/")[-1])
+    with open(path) as f:
+        return int(f.read())
+
+
+def add(left, right):
+    CALLS.append("add")
+    return left + right
+
+
+def write_total(total, destination):
+    CALLS.append("write")
+    with open(destination, "w") as f:
+        f.write(str(total))
+
+
+def build(tmp_path):
+    a, b, out = tmp_path / "a.txt", tmp_path / "b.txt", tmp_path / "out.txt"
+    return Pipeline(
+        [
+            Stage("a", partial(read_number, path=str(a)), inputs=[a]),
+            Stage("b", partial(read_number, path=str(b)), inputs=[b]),
+            Stage("total", add, deps={"left": "a", "right": "b"}),
+            Stage(
+                "written",
+                partial(write_total, destination=str(out)),
+                deps={"total": "total"},
+                outputs=[out],
+            ),
+        ],
+        cache_dir=tmp_path / "cache",
+    )
+
+
+def test_pipeline_only_reruns_changed_stages(tmp_path):
+    (tmp_path / "a.txt").write_text("1")
+    (tmp_path / "b.txt").write_text("2")
+    CALLS.clear()
+
+    assert build(tmp_path).run(targets=["total"]) == {"total": 3}
+    assert CALLS == ["a.txt", "b.txt", "add"]
+
+    CALLS.clear()
+    assert build(tmp_path).run(targets=["total"]) == {"total": 3}
+    assert CALLS == []
+
+    (tmp_path / "b.txt").write_text("5")
+    assert build(tmp_path).run(targets=["total"]) == {"total": 6}
+    assert CALLS == ["b.txt", "add"]
+
+
+def test_pipeline_reruns_stage_with_missing_output(tmp_path):
+    (tmp_path / "a.txt").write_text("1")
+    (tmp_path / "b.txt").write_text("2")
+    build(tmp_path).run(targets=["written"])
+
+    CALLS.clear()
+    (tmp_path / "out.txt").unlink()
+    build(tmp_path).run(targets=["written"])
+
+    assert CALLS == ["write"]
+    assert (tmp_path / "out.txt").read_text() == "3"
+
+
+def test_pipeline_force_reruns_everything(tmp_path):
+    (tmp_path / "a.txt").write_text("1")
+    (tmp_path / "b.txt").write_text("2")
+    build(tmp_path).run()
+
+    CALLS.clear()
+    build(tmp_path).run(targets=["total"], force=True)
+
+    assert CALLS == ["a.txt", "b.txt", "add"]
+
+
+def test_pipeline_runs_independent_stages_in_processes(tmp_path):
+    (tmp_path / "a.txt").write_text("1")
+    (tmp_path / "b.txt").write_text("2")
+
+    pipeline = build(tmp_path)
+    assert pipeline.run(targets=["total", "written"], jobs=2) == {"total": 3, "written": None}
+    assert (tmp_path / "out.txt").read_text() == "3"
+    stages = [r["name"] for r in pipeline.metrics.as_records() if r["kind"] == "stage"]
+    assert sorted(stages) == ["a", "b", "total", "written"]
+
+    CALLS.clear()
+    assert build(tmp_path).run(targets=["total"], jobs=2) == {"total": 3}
+    assert CALLS == []
+
+
+def copy_file(source, destination):
+    CALLS.append("copy")
+    with open(source) as f, open(destination, "w") as out:
+        out.write(f.read())
+
+
+def build_labelled(tmp_path, read_yaml=True):
+    # "labels" writes a yaml like file that "labelled" reads without taking
+    # its output, like the tech label yaml stages in munge.py
+    xlsx, yaml = tmp_path / "labels.xlsx", tmp_path / "labels.yml"
+    return Pipeline(
+        [
+            Stage("a", partial(read_number, path=str(tmp_path / "a.txt")), inputs=[tmp_path / "a.txt"]),
+            Stage("labels", partial(copy_file, source=str(xlsx), destination=str(yaml)),
+                  inputs=[xlsx], outputs=[yaml]),
+            Stage("labelled", partial(add, right=0), deps={"left": "a"}, after=["labels"],
+                  inputs=[yaml] if read_yaml else []),
+        ],
+        cache_dir=tmp_path / "cache",
+    )
+
+
+def test_pipeline_reruns_readers_of_a_written_file(tmp_path):
+    (tmp_path / "a.txt").write_text("1")
+    (tmp_path / "labels.xlsx").write_text("data science: data")
+    build_labelled(tmp_path).run(targets=["labelled"])
+
+    CALLS.clear()
+    (tmp_path / "labels.yml").write_text("data science: software")
+    build_labelled(tmp_path).run(targets=["labelled"])
+    assert CALLS == ["add"]
+
+    CALLS.clear()
+    (tmp_path / "labels.xlsx").write_text("data science: ai")
+    build_labelled(tmp_path).run(targets=["labelled"])
+    assert CALLS == ["copy", "add"]
+
+    CALLS.clear()
+    build_labelled(tmp_path).run(targets=["labelled"])
+    assert CALLS == []
+
+
+def test_pipeline_reruns_a_deleted_output_reached_through_after(tmp_path):
+    (tmp_path / "a.txt").write_text("1")
+    (tmp_path / "labels.xlsx").write_text("data science: data")
+    build_labelled(tmp_path, read_yaml=False).run(targets=["labelled"])
+
+    for jobs in [1, 2]:
+        CALLS.clear()
+        (tmp_path / "labels.yml").unlink()
+        assert build_labelled(tmp_path, read_yaml=False).run(targets=["labelled"], jobs=jobs) == {"labelled": 1}
+        assert (tmp_path / "labels.yml").read_text() == "data science: data"
+        if jobs == 1:
+            assert CALLS == ["copy"]
+
+
+def test_editing_a_helper_module_reruns_the_stage(tmp_path, monkeypatch):
+    package = tmp_path / "stagepkg"
+    package.mkdir()
+    (package / "__init__.py").write_text("")
+    (package / "helper.py").write_text("def double(x):\n    return 2 * x\n")
+    (package / "stages.py").write_text("from stagepkg.helper import double\n\n\ndef run():\n    return double(1)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    from stagepkg.stages import run
+
+    def build():
+        return Pipeline([Stage("doubled", run)], cache_dir=tmp_path / "cache")
+
+    before = build().fingerprint("doubled")
+    assert build().fingerprint("doubled") == before
+
+    (package / "helper.py").write_text("def double(x):\n    return x + x\n")
+    assert build().fingerprint("doubled") != before
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+
+from tekkieworden.processing.pivot import combine_sums, group_sum, pivot_gender
+
+
+LONG = pd.DataFrame(
+    {
+        "brinnummer_duo": ["25BE", "25BE", "21PC", None, "21PC"],
+        "opleidingscode_duo": ["34267", "34267", "50009", "1", "50009"],
+        "geslacht": pd.Categorical(["man", "vrouw", "vrouw", "man", None]),
+        "2018": pd.array([31, 3, 7, 1, 100], dtype="Int32"),
+        "2019": pd.array([1, None, 2, 1, 100], dtype="Int32"),
+    }
+)
+
+
+def test_pivot_gender_matches_groupby_unstack():
+    keys = ["brinnummer_duo", "opleidingscode_duo"]
+    wide = pivot_gender(LONG, keys=keys, year_cols=["2018", "2019"], suffix="_i")
+
+    expected = LONG.groupby(keys + ["geslacht"], observed=True)[["2018", "2019"]].sum().unstack("geslacht")
+    expected.columns = [f"{y}_{g}_i" for y, g in expected.columns]
+    expected = expected[["2018_man_i", "2018_vrouw_i", "2019_man_i", "2019_vrouw_i"]]
+
+    assert list(wide.columns) == list(expected.columns) + ["2018_tot_i", "2019_tot_i"]
+    assert list(wide.index) == list(expected.index)
+    np.testing.assert_array_equal(wide[expected.columns].to_numpy(), expected.to_numpy(dtype=float))
+    np.testing.assert_array_equal(wide["2018_tot_i"].to_numpy(), [7.0, 34.0])
+    assert np.isnan(wide.loc[("21PC", "50009"), "2018_man_i"])
+
+
+def test_group_sum_matches_groupby_sum():
+    keys = ["brinnummer_duo", "geslacht"]
+    summed = group_sum(LONG, keys=keys, value_cols=["2018", "2019"])
+    expected = LONG.groupby(keys, observed=True)[["2018", "2019"]].sum()
+
+    assert list(summed.index) == list(expected.index)
+    np.testing.assert_array_equal(summed.to_numpy(), expected.to_numpy(dtype=float))
+
+
+def test_combined_chunk_sums_match_one_pass():
+    keys = ["brinnummer_duo", "geslacht"]
+    # read_csv gives every chunk the categories it has seen itself, man or vrouw
+    chunks = [LONG.iloc[[0, 3]], LONG.iloc[[1, 2, 4]]]
+    chunks = [c.assign(geslacht=pd.Categorical(c["geslacht"].tolist())) for c in chunks]
+    combined = combine_sums(*[group_sum(c, keys=keys, value_cols=["2018", "2019"]) for c in chunks])
+
+    expected = group_sum(LONG, keys=keys, value_cols=["2018", "2019"])
+    pd.testing.assert_frame_equal(combined.sort_index(), expected.sort_index())
+    assert combined.index.get_level_values("geslacht").dtype == expected.index.get_level_values("geslacht").dtype
@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+
+from tekkieworden.processing.ranking import ALL_YEARS, RankingIndex
+
+
+def test_top_matches_a_stable_full_sort():
+    rng = np.random.default_rng(0)
+    counts = rng.integers(0, 20, size=(500, 3)).astype(float)
+    counts[rng.random(counts.shape) < 0.1] = np.nan
+    table = pd.DataFrame(counts, index=pd.Index([f"opl{i}" for i in range(500)], name="opleidingsnaam_duo"),
+                         columns=[2017, 2018, 2019])
+    index = RankingIndex(table)
+
+    for year, k in [(None, 15), (2018, 1), ("2017", 40), (ALL_YEARS, 15), (2019, 1000)]:
+        column = table.sum(axis=1, min_count=1) if year == ALL_YEARS else table[int(year or 2019)]
+        expected = column.dropna().sort_values(ascending=False, kind="stable")[:k]
+        top = index.top(k, year=year)
+        assert top.index.tolist() == expected.index.tolist()
+        np.testing.assert_array_equal(top.to_numpy(), expected.to_numpy())
+
+
+def test_selection_updates_the_ranked_values():
+    table = pd.DataFrame({2019: [5.0, 9.0, 7.0, np.nan]}, index=["a", "b", "c", "d"])
+    selection = RankingIndex(table).selection(values=["a", "c", "d"])
+    assert selection.top(2).index.tolist() == ["c", "a"]
+
+    selection.include(["b"]).exclude(["c", "unknown"])
+    assert selection.top(2).index.tolist() == ["b", "a"]
@@ -0,0 +1,114 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tekkieworden.config import schemas
+from tekkieworden.processing import readers
+
+
+FILES = {
+    "/hbo_i.csv": "BRIN NUMMER;OPLEIDINGSNAAM\r\n25BE;B Elektrotechniek\r\n".encode("ISO-8859-1"),
+    "/wo_i.csv": "BRIN NUMMER;INSTELLINGSNAAM\r\n21PC;Université\r\n".encode("ISO-8859-1"),
+    "/mbo_i.csv": ("00GT;Albeda;café\r\n" * 5000).encode("ISO-8859-1"),
+}
+
+
+class DuoStandIn(BaseHTTPRequestHandler):
+    failures = {}
+    served = []
+
+    def do_GET(self):
+        if self.failures.get(self.path, 0) > 0:
+            self.failures[self.path] -= 1
+            self.send_error(503)
+            return
+        body = FILES.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = f'"{hash(body)}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.served.append(self.path)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def duo_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DuoStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_download_duo_files_streams_utf8(duo_server, tmp_path):
+    entry = readers.download_duo_files(
+        url=duo_server + "/wo_i.csv", file="wo_inscriptions", path=tmp_path, chunk_size=7
+    )
+
+    with open(entry["path"], encoding="utf-8") as f:
+        assert f.read().splitlines()[1] == "21PC;Université"
+    assert [p.name for p in tmp_path.iterdir()] == [entry["path"].split("/")[-1]]
+    assert entry["changed"]
+
+
+def test_download_all_fetches_in_parallel_with_retries(duo_server, tmp_path):
+    DuoStandIn.failures = {"/hbo_i.csv": 2}
+    downloads = [(duo_server + name, name.strip("/")[:-4]) for name in FILES]
+
+    entries = readers.download_all(
+        downloads=downloads, max_workers=3, path=tmp_path, backoff=0.01
+    )
+
+    assert sorted(entries) == ["hbo_i", "mbo_i", "wo_i"]
+    with open(entries["mbo_i"]["path"], "rb") as f:
+        assert f.read() == FILES["/mbo_i.csv"].decode("ISO-8859-1").encode("utf-8")
+
+
+def test_download_all_revalidates_unchanged_files(duo_server, tmp_path):
+    downloads = [(duo_server + name, name.strip("/")[:-4]) for name in FILES]
+    first = readers.download_all(downloads=downloads, path=tmp_path)
+    assert all(entry["changed"] for entry in first.values())
+
+    DuoStandIn.served = []
+    (tmp_path / readers._manifest_key("wo_i")).write_text("truncated")
+    entries = readers.download_all(downloads=downloads, path=tmp_path)
+
+    assert DuoStandIn.served == ["/wo_i.csv"]
+    assert not any(entry["changed"] for entry in entries.values())
+    manifest = readers.load_download_manifest(path=tmp_path)
+    assert manifest["hbo_i_2019.csv"]["etag"] == f'"{hash(FILES["/hbo_i.csv"])}"'
+
+
+def test_download_all_gives_up_on_missing_file(duo_server, tmp_path):
+    with pytest.raises(readers.requests.HTTPError):
+        readers.download_all(
+            downloads=[(duo_server + "/missing.csv", "missing"), (duo_server + "/hbo_i.csv", "hbo_i")],
+            path=tmp_path,
+        )
+    assert [p.name for p in tmp_path.glob("*.csv")] == ["hbo_i_2019.csv"]
+    # the file that did download is not fetched again on the next run
+    assert list(readers.load_download_manifest(path=tmp_path)) == ["hbo_i_2019.csv"]
+
+
+def test_detect_ho_duo_type_reads_the_header(tmp_path):
+    for duo_type in ["wo_i", "wo_d"]:
+        header = ";".join(schemas.DUO_SCHEMAS[duo_type]["usecols"] + ["2018", "2019"])
+        (tmp_path / "renamed.csv").write_text(header + "\n")
+        assert readers.detect_ho_duo_type(tmp_path, "renamed.csv", "wo") == duo_type
+
+    (tmp_path / "mbo.csv").write_text("BRIN NUMMER;KWALIFICATIE CODE;MAN2019\n")
+    with pytest.raises(ValueError):
+        readers.detect_ho_duo_type(tmp_path, "mbo.csv", "wo")
@@ -0,0 +1,40 @@
+import threading
+import time
+
+from tekkieworden.processing.render_cache import RenderCache
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(maxsize=2)
+    cache.put(("Ingeschrevenen", "tech_label", ()), b"png-1")
+    cache.put(("Ingeschrevenen", "ho_type", ()), b"png-2")
+    assert cache.get(("Ingeschrevenen", "tech_label", ())) == b"png-1"
+
+    cache.put(("Gediplomeerden", "tech_label", ()), b"png-3")
+
+    assert ("Ingeschrevenen", "ho_type", ()) not in cache
+    assert ("Ingeschrevenen", "tech_label", ()) in cache
+    assert len(cache) == 2
+
+
+def test_concurrent_misses_render_once():
+    cache = RenderCache(maxsize=4)
+    calls = []
+
+    def render():
+        calls.append(1)
+        time.sleep(0.05)
+        return b"png"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_render("key", render))) for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"png"] * 8
+    assert len(calls) == 1
+    assert cache.stats() == {"size": 1, "maxsize": 4, "hits": 7, "misses": 1}
@@ -0,0 +1,73 @@
+import threading
+
+import pandas as pd
+import pytest
+import requests
+
+from tekkieworden import dashboard_data, serve
+from tekkieworden.config import config
+from tekkieworden.processing.cube import build_cube
+from tekkieworden.processing.facts import build_facts
+from tekkieworden.processing.render_cache import RenderCache
+from tekkieworden.processing.writers import write_df
+
+
+@pytest.fixture
+def api(munged, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PATH_TO_MUNGED_DATA", tmp_path)
+    monkeypatch.setattr(dashboard_data, "_cubes", {})
+    monkeypatch.setattr(serve, "responses", RenderCache(maxsize=8))
+    write_df(build_cube(build_facts(munged), ["tech_label"]), name=config.MUNGED_HO_CUBE, export_csv=False)
+
+    server = serve.make_server(port=0, workers=2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_api_answers_queries_and_rejects_bad_parameters(api):
+    params = {"level": "ho", "dimension": "tech_label", "measure": "ingeschrevenen"}
+
+    top = requests.get(f"{api}/top", params={**params, "n": 2}).json()
+    assert top["index"] == ["security", "data"]
+    assert top["data"] == [[20.0], [11.0]]
+
+    series = requests.get(f"{api}/timeseries", params={**params, "values": ["data", "software"]}).json()
+    assert series["columns"] == [2018, 2019]
+    assert series["index"] == ["data", "software"]
+
+    gender = requests.get(f"{api}/gender", params={**params, "year": 2018}).json()
+    assert gender["columns"] == ["man", "tot"]
+    assert gender["data"][gender["index"].index("security")] == [None, 4.0]
+
+    assert requests.get(f"{api}/top", params={**params, "dimension": "gemeente"}).status_code == 400
+    assert requests.get(f"{api}/top", params={**params, "n": 0}).status_code == 400
+    assert requests.get(f"{api}/rollups").status_code == 404
+
+    assert requests.get(f"{api}/top", params={**params, "n": 2}).json() == top
+    cache = requests.get(f"{api}/health").json()["cache"]
+    assert (cache["size"], cache["hits"]) == (3, 1)
+
+
+def test_dashboard_data_is_a_thin_client_of_the_api(api, monkeypatch):
+    local = dashboard_data.top_n("ho", "tech_label", "ingeschrevenen", year="all")
+
+    monkeypatch.setattr(config, "API_URL", api)
+    remote = dashboard_data.top_n("ho", "tech_label", "ingeschrevenen", year="all")
+
+    pd.testing.assert_frame_equal(remote, local, check_index_type=False)
+    assert dashboard_data.data_version() == dashboard_data.cube_versions()
+
+
+def test_an_empty_selection_returns_no_rows_over_the_api(api, monkeypatch):
+    query = {"level": "ho", "dimension": "tech_label", "measure": "ingeschrevenen", "values": []}
+    local = [dashboard_data.time_series(**query), dashboard_data.top_n(**query)]
+
+    monkeypatch.setattr(config, "API_URL", api)
+    remote = [dashboard_data.time_series(**query), dashboard_data.top_n(**query)]
+
+    for remote_df, local_df in zip(remote, local):
+        assert remote_df.empty and local_df.empty
+        assert remote_df.columns.tolist() == local_df.columns.tolist()
@@ -0,0 +1,37 @@
+import math
+
+import numpy as np
+
+from tekkieworden.processing.sparklines import create_spark_charts, spark_chars, spark_lines
+
+
+def spark_for_row(series):
+    # per value reference with the scaling of the old row-wise implementation
+    values = [n for n in series if not math.isnan(n)]
+    if not values or max(values) == min(values):
+        return "".join(" " if math.isnan(n) else spark_chars[0] for n in series)
+    coefficient = (len(spark_chars) - 1.0) / (max(values) - min(values))
+    return "".join(
+        " " if math.isnan(n) else spark_chars[int(round((n - min(values)) * coefficient))] for n in series
+    )
+
+
+def test_spark_lines_match_the_row_wise_reference():
+    rng = np.random.default_rng(1)
+    data = rng.integers(0, 500, size=(200, 5)).astype(float)
+    data[rng.random(data.shape) < 0.15] = np.nan
+    data[0] = np.nan
+    data[1] = 7.0
+
+    assert spark_lines(data).tolist() == [spark_for_row(row) for row in data]
+
+
+def test_scaling_rounds_after_scaling():
+    # rounding before scaling drew 1 as the lowest bar
+    assert create_spark_charts([0, 1, 7]) == "▁▂█"
+    assert create_spark_charts([0, 20, 10], minimum=0, maximum=10) == "▁██"
+
+
+def test_global_scale_compares_rows():
+    assert spark_lines([[0, 7], [7, 7]], scale="global").tolist() == ["▁█", "██"]
+    assert spark_lines([[0, 7], [7, 7]], scale="row").tolist() == ["▁█", "▁▁"]
@@ -0,0 +1,71 @@
+import shutil
+
+import pandas as pd
+import pytest
+
+from tekkieworden.processing import store
+
+
+def release(first_year, figure):
+    years = range(first_year, first_year + 3)
+    data = {"opleidingscode_duo": ["34267"], "tech_label": ["data"], "gemeentenummer_duo": [["0106"]]}
+    for year in years:
+        data.update({f"{year}_man_i": [figure], f"{year}_vrouw_i": [1.0], f"{year}_tot_i": [figure + 1]})
+    return pd.DataFrame(data)
+
+
+def test_to_long_melts_figure_columns():
+    long_df = store.to_long(release(2017, 10.0))
+
+    assert list(long_df.columns) == ["opleidingscode_duo", "tech_label", "count", "year", "gender", "measure"]
+    assert len(long_df) == 9
+    row = long_df[(long_df.year == 2019) & (long_df.gender == "tot")].iloc[0]
+    assert (row["measure"], row["count"]) == ("ingeschrevenen", 11.0)
+
+
+def test_ingest_is_append_only(tmp_path):
+    store.ingest(release(2017, 10.0), release=2019, level="hbo", path=tmp_path)
+
+    with pytest.raises(FileExistsError):
+        store.ingest(release(2017, 10.0), release=2019, level="hbo", path=tmp_path)
+    with pytest.raises(ValueError):
+        store.ingest(release(2017, 10.0), release=2019, level="havo", path=tmp_path)
+
+
+def test_query_and_trend_over_releases(tmp_path):
+    store.ingest(release(2017, 10.0), release=2019, level="hbo", path=tmp_path)
+    store.ingest(release(2018, 20.0), release=2020, level="hbo", path=tmp_path)
+    store.ingest(release(2018, 5.0), release=2020, level="wo", path=tmp_path)
+
+    wo = store.query(levels=["wo"], years=[2019], columns=["gender"], path=tmp_path)
+    assert set(wo.release) == {2020} and set(wo.year) == {2019}
+    assert list(wo.columns) == ["gender", "year", "count", "release", "level"]
+
+    hbo = store.trend(levels=["hbo"], columns=["gender", "measure"], path=tmp_path)
+    totals = hbo[hbo.gender == "tot"].set_index("year")
+    assert totals["release"].to_dict() == {2017: 2019, 2018: 2020, 2019: 2020, 2020: 2020}
+    assert totals.loc[2018, "count"] == 21.0
+
+
+def test_partitions_skip_interrupted_ingests(tmp_path):
+    partition = store.ingest(release(2017, 10.0), release=2019, level="hbo", path=tmp_path)
+    # a half-written partition of an ingest that was killed before the rename
+    shutil.copytree(partition, store.partition_path(2019, "wo", path=tmp_path) + store.TMP_SUFFIX)
+
+    assert store.partitions(path=tmp_path)["level"].tolist() == ["hbo"]
+    assert set(store.query(path=tmp_path).level) == {"hbo"}
+
+
+def test_ingest_release_stores_every_study_once(tmp_path):
+    ho = pd.concat([release(2017, 10.0).assign(ho_type="hbo"), release(2017, 3.0).assign(ho_type="wo")])
+    mbo = pd.concat([release(2017, 8.0), release(2017, 2.0).assign(tech_label="no_tech")])
+
+    stored = store.ingest_release(ho, mbo, release=2019, path=tmp_path)
+    assert len(stored) == 3
+    assert set(store.query(levels=["mbo"], columns=["tech_label"], path=tmp_path).tech_label) == {"data", "no_tech"}
+
+    # a rerun of the munge pipeline on the same release adds nothing
+    shutil.rmtree(store.partition_path(2019, "wo", path=tmp_path))
+    assert store.ingest_release(ho, mbo, release=2019, path=tmp_path) == [
+        store.partition_path(2019, "wo", path=tmp_path)
+    ]
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+
+from tekkieworden.processing.utilities import JoinReport, pandas_join, pandas_join_key_dual
+
+
+LEFT = pd.DataFrame({"brinnummer_duo": ["21PC", "25BE", "00MF"], "opleidingscode_duo": ["1", "2", "3"]})
+RIGHT = pd.DataFrame({"brinnummer_sdb": ["21PC", "30AA"], "opleidingscode_sdb": ["1", "9"], "cluster_sdb": ["a", "b"]})
+
+
+def test_join_without_report_has_no_indicator():
+    joined = pandas_join_key_dual(
+        LEFT, RIGHT, ["brinnummer_duo", "opleidingscode_duo"], ["brinnummer_sdb", "opleidingscode_sdb"], how="left"
+    )
+
+    assert "_merge" not in joined.columns
+    assert len(joined) == 3
+
+
+def test_join_report_collects_match_statistics():
+    report = JoinReport("duo_sdb")
+
+    pandas_join(LEFT, RIGHT, how="left", left_on="brinnummer_duo", right_on="brinnummer_sdb",
+                categorical_keys=True, report=report)
+
+    assert (report.left_rows, report.right_rows, report.rows) == (3, 2, 3)
+    assert (report.both, report.left_only) == (1, 2)
+    assert report.unmatched_keys == ["25BE", "00MF"]
+    assert report.match_ratio == pytest.approx(1 / 3)
+
+
+def test_join_validates_cardinality():
+    with pytest.raises(pd.errors.MergeError):
+        pandas_join(LEFT, pd.concat([RIGHT, RIGHT]), how="left", left_on="brinnummer_duo",
+                    right_on="brinnummer_sdb", validate="many_to_one")
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+
+from tekkieworden.processing.readers import read_munged_file, munged_columns
+from tekkieworden.processing.writers import write_df
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "feather", "csv"])
+def test_write_df_round_trip_keeps_codes(tmp_path, fmt):
+    df = pd.DataFrame(
+        {
+            "brinnummer_duo": ["00MF", "21PC"],
+            "opleidingscode_duo": ["04913", "50700"],
+            "kwalificatie_code": [22166.0, None],
+            "opleidingsnaam_duo": ["Crossover Creativity", "Rechtsgeleerdheid"],
+            "2019_tot_i": [21, 19],
+        }
+    )
+
+    write_df(df, "opleidingen", fmt=fmt, export_csv=False, path=tmp_path)
+    result = read_munged_file(
+        "opleidingen",
+        columns=["opleidingscode_duo", "kwalificatie_code", "2019_tot_i"],
+        fmt=fmt,
+        path=tmp_path,
+    )
+
+    assert munged_columns("opleidingen", fmt=fmt, path=tmp_path) == df.columns.tolist()
+    assert result.opleidingscode_duo.tolist() == ["04913", "50700"]
+    assert result.kwalificatie_code[0] == "22166"
+    assert result.kwalificatie_code.isnull()[1]
+    assert result["2019_tot_i"].dtype == "float64"